@@ -0,0 +1,291 @@
+"""
+Offline end-to-end benchmark for the render pipeline.
+
+Generates synthetic fixtures (test-pattern background videos, tone/silence
+narration, a canned story and word timings), stubs the network stages
+(Groq, Edge TTS, Google Drive, Whisper model download) and times the rest
+of the pipeline plus per-frame microbenchmarks. Results are written to
+bench/results/<commit>.json and compared against the previous run.
+
+Usage:
+    python bench/bench.py
+    python bench/bench.py --resolutions 540x960 1080x1920 --compare bench/results/abc123.json
+    ZOMBIE_RENDER_MODE=pipelined python bench/bench.py
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT_DIR = os.path.join(REPO_ROOT, "script")
+RESULTS_DIR = os.path.join(REPO_ROOT, "bench", "results")
+WORK_DIR = os.path.join(REPO_ROOT, "bench", "work")
+
+DEFAULT_RESOLUTIONS = ["540x960", "1080x1920"]
+FPS = 30
+TITLE_SECONDS = 2.0
+BODY_SECONDS = 8.0
+BG_SECONDS = 20.0
+MICRO_FRAMES = 120
+
+STORY = {
+    "Story Title": "Have you ever heard something knocking from inside your walls?",
+    "Story Body": "So last week I was home alone when the knocking started, three slow taps behind the "
+                  "bedroom wall, and every night since then it has moved a little closer to my bed.",
+    "SEX": "m",
+    "Video Caption": "Never knock back",
+    "SEX2": "f",
+}
+
+try:
+    import resource  # Not available on Windows
+except ImportError:
+    resource = None
+
+def ffmpeg(*args):
+    subprocess.run(["ffmpeg", "-y", "-v", "error", *args], check=True)
+
+def canned_word_durations(start, duration, spacing=0.4):
+    """Word timings shaped like edit.generate_word_level_subtitles output."""
+    words = STORY["Story Body"].split()
+    rng = random.Random(0)
+    timings = []
+    t = start
+    for word in words:
+        if t + spacing > start + duration:
+            break
+        timings.append({"word": word, "start": t, "end": t + spacing, "duration": spacing,
+                        "color": (255, 0, 0) if rng.random() < 0.15 else (255, 255, 255)})
+        t += spacing
+    if timings:
+        timings[-1]["end"] += 1.0
+        timings[-1]["duration"] += 1.0
+    return timings
+
+def make_fixtures(work_dir, resolution):
+    """Builds a self-contained working tree for one resolution and returns its path."""
+    width, height = (int(v) for v in resolution.split("x"))
+    root = os.path.join(work_dir, resolution)
+    shutil.rmtree(root, ignore_errors=True)
+    for sub in ("content", "audio", "txt"):
+        os.makedirs(os.path.join(root, sub))
+
+    # Static assets come from the repo
+    for asset in ("content/font.ttf", "content/post.png"):
+        shutil.copy(os.path.join(REPO_ROOT, asset), os.path.join(root, asset))
+
+    # Test-pattern background and looping music
+    ffmpeg("-f", "lavfi", "-i", f"testsrc2=size={width}x{height}:rate={FPS}", "-t", str(BG_SECONDS),
+           "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p",
+           os.path.join(root, "content/bg.mp4"))
+    ffmpeg("-f", "lavfi", "-i", "sine=frequency=220:duration=5",
+           os.path.join(root, "content/bg.mp3"))
+
+    # Narration: a steady tone for the title, gated tone (speech-like on/off) for the body
+    ffmpeg("-f", "lavfi", "-i", f"sine=frequency=440:duration={TITLE_SECONDS}",
+           os.path.join(root, "audio/title.mp3"))
+    ffmpeg("-f", "lavfi", "-i", f"aevalsrc=sin(2*PI*330*t)*lt(mod(t\\,1)\\,0.6):s=24000:d={BODY_SECONDS}",
+           os.path.join(root, "audio/body.mp3"))
+
+    with open(os.path.join(root, "txt/index.txt"), "w", encoding="utf-8") as f:
+        json.dump(STORY, f)
+    return root
+
+def peak_rss_bytes():
+    if resource is None:
+        return None
+    scale = 1 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale
+    return max(own, children)
+
+def time_per_frame(fn, frames):
+    start = time.perf_counter()
+    for i in range(frames):
+        fn(i)
+    elapsed = time.perf_counter() - start
+    return round(frames / elapsed, 2) if elapsed > 0 else None
+
+def run_microbenchmarks(edit, root, width, height, word_durations):
+    import numpy as np
+    from edit1 import render_title_card
+
+    results = {}
+    frame = np.full((height, width, 3), 96, dtype=np.uint8)
+    word = dict(word_durations[0], start=0.0, end=10.0)
+    results["process_subtitle_frame_fps"] = time_per_frame(
+        lambda i: edit.process_subtitle_frame(frame.copy(), word, i / FPS, width, height), MICRO_FRAMES)
+
+    overlay_size = int(min(width, height) / 1.2)
+    overlay = render_title_card(STORY["Story Title"], overlay_size)
+    overlay_frames = MICRO_FRAMES
+    zoom = fall = int(FPS * 0.3)
+    results["apply_title_overlay_fps"] = time_per_frame(
+        lambda i: edit.apply_title_overlay(frame, i, FPS, width, height, overlay, overlay_size,
+                                           overlay_frames, zoom, fall), MICRO_FRAMES)
+
+    import timeline
+    start = time.perf_counter()
+    frame_timeline = timeline.compile_timeline(word_durations, FPS, int((TITLE_SECONDS + BODY_SECONDS) * FPS),
+                                               height, edit.BASE_FONT_SIZE, edit.MAX_FONT_SIZE, overlay_size,
+                                               int(TITLE_SECONDS * FPS), zoom, fall)
+    results["compile_timeline_ms"] = round((time.perf_counter() - start) * 1000, 3)
+
+    out_path = os.path.join(root, "bench_chunk.mp4")
+    start = time.perf_counter()
+    import scratch
+    edit.process_frame_range(scratch.path("edit1.mp4"), 0, MICRO_FRAMES, FPS, width, height,
+                             word_durations, frame_timeline, overlay, out_path)
+    elapsed = time.perf_counter() - start
+    results["process_frame_range_fps"] = round(MICRO_FRAMES / elapsed, 2)
+    os.remove(out_path)
+    return results
+
+def run_pipeline(root, resolution):
+    """Runs every stage in-process against the fixtures and returns its measurements."""
+    job = f"bench-{resolution}-{int(time.time())}"
+    os.environ["ZOMBIE_JOB_ID"] = job
+    os.environ["ZOMBIE_TRACE_DIR"] = os.path.join(root, "traces")
+    os.environ["ZOMBIE_SEED"] = "0"
+    os.chdir(root)
+
+    # Imported after the environment is set so tracing picks up the bench trace dir
+    import tracing
+    import ai
+    import video
+    import edit
+    import scratch
+
+    width, height = (int(v) for v in resolution.split("x"))
+    word_durations = canned_word_durations(TITLE_SECONDS, BODY_SECONDS)
+
+    # Network stages are replaced with fixture writers; everything else is the real code
+    video.download_from_drive = lambda file_id, output_path: None
+    edit.generate_word_level_subtitles = lambda *args, **kwargs: [dict(w) for w in word_durations]
+
+    started = time.perf_counter()
+    with tracing.span("stage.ai", stub=True):
+        ai.sort_and_save_parsed_data("txt/index.txt", scratch.job_dir(job))
+    with tracing.span("stage.audio", stub=True):
+        # The narration fixtures stand in for the TTS output
+        for name in ("title.mp3", "body.mp3"):
+            shutil.copy(os.path.join("audio", name), scratch.path(name, job))
+    with tracing.span("stage.video"):
+        video.main()
+    with tracing.span("stage.edit"):
+        edit.main()
+    total = time.perf_counter() - started
+
+    stages = {}
+    for record in tracing.load_spans(job):
+        stats = stages.setdefault(record["span"], {"count": 0, "wall_s": 0.0})
+        stats["count"] += 1
+        stats["wall_s"] = round(stats["wall_s"] + record["wall_s"], 4)
+        if "frames_per_s" in record:
+            stats.setdefault("frames_per_s", []).append(record["frames_per_s"])
+
+    # Microbenchmarks decode the job's scratch copy of EDIT1, so release it only afterwards
+    micro = run_microbenchmarks(edit, root, width, height, word_durations)
+    scratch.release(job)
+    import artifacts
+    output = artifacts.video_path(job)
+    return {
+        "render_mode": edit.RENDER_MODE,
+        # ffmpeg.mux (render.pipeline when pipelined) covers the whole ladder; compare runs with the same one
+        "renditions": artifacts.read_manifest(job),
+        "total_wall_s": round(total, 3),
+        "spans": stages,
+        "micro": micro,
+        "peak_rss_bytes": peak_rss_bytes(),
+        "output_bytes": os.path.getsize(output) if os.path.exists(output) else None,
+    }
+
+def git_revision():
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                                capture_output=True, text=True, check=True)
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=REPO_ROOT,
+                               capture_output=True, text=True).stdout.strip()
+        return result.stdout.strip() + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def run_resolution(resolution, work_dir):
+    """Runs one resolution in a child process so stage imports and peak RSS don't leak between runs."""
+    result = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", resolution,
+                             "--work-dir", work_dir], capture_output=True, text=True)
+    if result.returncode != 0:
+        print(result.stdout)
+        print(result.stderr)
+        raise RuntimeError(f"Benchmark for {resolution} failed")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def flatten(results):
+    """Maps each comparable metric to a single number."""
+    flat = {}
+    for resolution, data in results["resolutions"].items():
+        flat[f"{resolution}.total_wall_s"] = data["total_wall_s"]
+        for name, stats in data["spans"].items():
+            flat[f"{resolution}.span.{name}.wall_s"] = stats["wall_s"]
+        for name, value in data["micro"].items():
+            flat[f"{resolution}.micro.{name}"] = value
+        if data.get("peak_rss_bytes"):
+            flat[f"{resolution}.peak_rss_mb"] = round(data["peak_rss_bytes"] / 2**20, 1)
+    return flat
+
+def compare(current, previous):
+    old = flatten(previous)
+    print(f"\nComparison against {previous['revision']}:")
+    for key, value in sorted(flatten(current).items()):
+        before = old.get(key)
+        if before in (None, 0) or value is None:
+            print(f"  {key:60s} {value}")
+            continue
+        change = (value - before) / before * 100
+        print(f"  {key:60s} {before} -> {value} ({change:+.1f}%)")
+
+def latest_result(exclude):
+    files = sorted(glob.glob(os.path.join(RESULTS_DIR, "*.json")), key=os.path.getmtime)
+    files = [f for f in files if os.path.abspath(f) != os.path.abspath(exclude)]
+    return files[-1] if files else None
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline render pipeline benchmark")
+    parser.add_argument("--resolutions", nargs="+", default=DEFAULT_RESOLUTIONS)
+    parser.add_argument("--work-dir", default=WORK_DIR)
+    parser.add_argument("--compare", help="Result file to compare against (default: previous run)")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    sys.path.insert(0, SCRIPT_DIR)
+
+    if args.child:
+        root = make_fixtures(args.work_dir, args.child)
+        data = run_pipeline(root, args.child)
+        print(json.dumps(data))
+        return
+
+    results = {"revision": git_revision(), "timestamp": time.time(), "resolutions": {}}
+    for resolution in args.resolutions:
+        print(f"Benchmarking {resolution}...")
+        results["resolutions"][resolution] = run_resolution(resolution, args.work_dir)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    output = os.path.join(RESULTS_DIR, f"{results['revision']}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to {output}")
+
+    previous = args.compare or latest_result(output)
+    if previous:
+        with open(previous, "r", encoding="utf-8") as f:
+            compare(results, json.load(f))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Compares word timestamps of a candidate Whisper backend against the stock
+fp32 model on a set of narration files and reports drift and speedup.
+
+Usage:
+    python bench/whisper_drift.py --backend int8 --threads 4
+    python bench/whisper_drift.py --backend int8 --audio narration/*.mp3
+"""
+import argparse
+import difflib
+import json
+import os
+import re
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_ROOT, "bench", "results")
+sys.path.insert(0, os.path.join(REPO_ROOT, "script"))
+
+# Real speech ships with the repo; synthetic tones have nothing to align
+DEFAULT_AUDIO = [os.path.join(REPO_ROOT, "audio", "title.mp3"), os.path.join(REPO_ROOT, "audio", "body.mp3")]
+
+def normalize(word):
+    return re.sub(r"[^a-z0-9']", "", word.lower())
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))
+    return values[index]
+
+def summarize(values):
+    if not values:
+        return {"mean_ms": None, "p50_ms": None, "p95_ms": None, "max_ms": None}
+    return {
+        "mean_ms": round(sum(values) / len(values) * 1000, 1),
+        "p50_ms": round(percentile(values, 50) * 1000, 1),
+        "p95_ms": round(percentile(values, 95) * 1000, 1),
+        "max_ms": round(max(values) * 1000, 1),
+    }
+
+def run_backend(model_name, backend, threads, clips):
+    import whisper_backend
+
+    started = time.perf_counter()
+    model = whisper_backend.load_model(model_name, backend, threads)
+    load_s = time.perf_counter() - started
+
+    words = {}
+    transcribe_s = 0.0
+    for path, samples in clips.items():
+        started = time.perf_counter()
+        words[path] = whisper_backend.transcribe_words(model, samples)
+        transcribe_s += time.perf_counter() - started
+    return {"load_s": round(load_s, 3), "transcribe_s": round(transcribe_s, 3), "words": words}
+
+def compare_words(reference, candidate):
+    """Matches words by text and returns absolute start/end drifts in seconds."""
+    ref_text = [normalize(w["word"]) for w in reference]
+    cand_text = [normalize(w["word"]) for w in candidate]
+    matcher = difflib.SequenceMatcher(a=ref_text, b=cand_text, autojunk=False)
+    start_drift, end_drift = [], []
+    for block in matcher.get_matching_blocks():
+        for k in range(block.size):
+            ref, cand = reference[block.a + k], candidate[block.b + k]
+            start_drift.append(abs(ref["start"] - cand["start"]))
+            end_drift.append(abs(ref["end"] - cand["end"]))
+    return start_drift, end_drift
+
+def main():
+    parser = argparse.ArgumentParser(description="Whisper backend word-timestamp drift report")
+    parser.add_argument("--model", default="base")
+    parser.add_argument("--backend", default="int8")
+    parser.add_argument("--threads", type=int, default=0)
+    parser.add_argument("--audio", nargs="+", default=DEFAULT_AUDIO)
+    args = parser.parse_args()
+
+    import whisper
+
+    clips = {path: whisper.load_audio(path) for path in args.audio}
+    audio_s = sum(len(samples) for samples in clips.values()) / whisper.audio.SAMPLE_RATE
+
+    print(f"Running reference {args.model}/fp32 on {len(clips)} clip(s), {audio_s:.1f}s of audio...")
+    reference = run_backend(args.model, "fp32", args.threads, clips)
+    print(f"Running candidate {args.model}/{args.backend}...")
+    candidate = run_backend(args.model, args.backend, args.threads, clips)
+
+    report = {"model": args.model, "backend": args.backend, "threads": args.threads,
+              "audio_s": round(audio_s, 2), "clips": {}}
+    all_start, all_end = [], []
+    ref_total = cand_total = matched_total = 0
+    for path in clips:
+        ref_words, cand_words = reference["words"][path], candidate["words"][path]
+        start_drift, end_drift = compare_words(ref_words, cand_words)
+        all_start += start_drift
+        all_end += end_drift
+        ref_total += len(ref_words)
+        cand_total += len(cand_words)
+        matched_total += len(start_drift)
+        report["clips"][os.path.relpath(path, REPO_ROOT)] = {
+            "reference_words": len(ref_words),
+            "candidate_words": len(cand_words),
+            "matched_words": len(start_drift),
+            "start_drift": summarize(start_drift),
+            "end_drift": summarize(end_drift),
+        }
+
+    report.update({
+        "word_match_rate": round(matched_total / ref_total, 4) if ref_total else None,
+        "start_drift": summarize(all_start),
+        "end_drift": summarize(all_end),
+        "reference": {k: reference[k] for k in ("load_s", "transcribe_s")},
+        "candidate": {k: candidate[k] for k in ("load_s", "transcribe_s")},
+        "transcribe_speedup": round(reference["transcribe_s"] / candidate["transcribe_s"], 2)
+        if candidate["transcribe_s"] else None,
+    })
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    output = os.path.join(RESULTS_DIR, f"whisper-drift-{args.model}-{args.backend}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"Matched {matched_total}/{ref_total} reference words ({cand_total} candidate words)")
+    print(f"Start drift: {report['start_drift']}")
+    print(f"End drift:   {report['end_drift']}")
+    print(f"Transcribe: {reference['transcribe_s']}s fp32 vs {candidate['transcribe_s']}s "
+          f"{args.backend} ({report['transcribe_speedup']}x)")
+    print(f"Report saved to {output}")
+
+if __name__ == "__main__":
+    main()
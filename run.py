@@ -1,99 +1,167 @@
-import subprocess
 import os
-import time
+import sys
 import random
+import uuid
 import flask
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, request, jsonify, send_file, url_for
 import threading
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "script"))
+import tracing
+import seeding
+import artifacts
+import encoding
+import job_queue
+import admission
+import pipeline
+
 app = Flask(__name__)
 
-# Number of scripts
-total_scripts = 11
+# Aggregated per-stage timings of every job writing to ZOMBIE_TRACE_DIR, this
+# process's and worker.py's alike, exposed on /metrics
+metrics = tracing.MetricsRegistry()
 
-# The path to the topic file
+# The list of topics to pick from; each job's own topic goes to its scratch directory
 topic_file = "txt/topic.txt"
 
-def randomize_topic():
+# With ZOMBIE_QUEUE_URL set, jobs are handed to worker.py processes instead of
+# running in this one
+queue = job_queue.open_queue() if job_queue.QUEUE_URL else None
+
+# Jobs run in this process wait here for a job slot and enough free RAM/CPU
+gate = admission.JobGate()
+# Seconds a refused client is asked to wait before retrying
+RETRY_AFTER_SECONDS = 30
+
+def randomize_topic(seed=None):
     try:
         with open(topic_file, "r", encoding='utf-8') as file:
             topics = file.readlines()
         if topics:
-            return random.choice(topics).strip()
+            return seeding.rng("topic", seed).choice(topics).strip()
         else:
             return None
     except FileNotFoundError:
         raise FileNotFoundError("Topic file not found.")
 
-def save_topic_to_file(topic):
-    try:
-        # Clear the contents of topic.txt before saving the new topic
-        with open("txt/topic.txt", "w", encoding='utf-8') as file:
-            file.write(f"{topic}\n")
-    except Exception as e:
-        print(f"Error saving topic to file: {e}")
-
-def run_scripts(topic, completion_event):
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return Response(metrics.render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+def send_video(job_id, as_attachment, rendition=encoding.SOURCE_RENDITION):
+    # conditional=True answers Range requests with 206 and If-None-Match /
+    # If-Modified-Since with 304; a job's video never changes once published
+    suffix = "" if rendition == encoding.SOURCE_RENDITION else f"-{rendition}"
+    response = send_file(artifacts.rendition_path(job_id, rendition), mimetype='video/mp4',
+                         as_attachment=as_attachment, download_name=f"{job_id}{suffix}.mp4",
+                         conditional=True, etag=True, max_age=31536000)
+    response.headers["Accept-Ranges"] = "bytes"
+    response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response
+
+@app.route('/videos/<job_id>', methods=['GET', 'HEAD'])
+def download_video(job_id):
+    rendition = request.args.get('rendition', encoding.SOURCE_RENDITION)
+    if rendition not in encoding.RENDITION_LADDER:
+        return jsonify({"error": f"Unknown rendition, choose from: {', '.join(encoding.RENDITION_LADDER)}"}), 400
+    if not artifacts.valid_job_id(job_id) or not os.path.exists(artifacts.rendition_path(job_id, rendition)):
+        return jsonify({"error": "Video file not found!"}), 404
+    return send_video(job_id, request.args.get('download') == '1', rendition)
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    if not artifacts.valid_job_id(job_id):
+        return jsonify({"error": "Job not found!"}), 404
+    status = queue.get(job_id) if queue else None
+    position = gate.position(job_id)
+    if status is None and position is not None:
+        # Waiting for, or holding, a job slot in this process
+        status = {"id": job_id, "state": job_queue.RUNNING if position < 0 else job_queue.QUEUED}
+        if position >= 0:
+            status["position"] = position
+    if status is None:
+        # Jobs run in-process aren't tracked; a published video is all there is
+        if not os.path.exists(artifacts.video_path(job_id)):
+            return jsonify({"error": "Job not found!"}), 404
+        status = {"id": job_id, "state": job_queue.DONE}
+    if status["state"] == job_queue.DONE:
+        status["video_url"] = url_for('download_video', job_id=job_id)
+        # Renditions are looked up on disk, since workers may run with another ladder
+        status["renditions"] = {
+            rendition: url_for('download_video', job_id=job_id, rendition=rendition)
+            for rendition in encoding.RENDITION_LADDER
+            if os.path.exists(artifacts.rendition_path(job_id, rendition))
+        }
+        # Requested renditions that weren't smaller than the source
+        status["skipped_renditions"] = (artifacts.read_manifest(job_id) or {}).get("skipped", [])
+    return jsonify(status)
+
+def busy(position, running):
+    response = jsonify({"error": "Server is busy, try again later.", "position": position, "running": running})
+    response.status_code = 429
+    response.headers["Retry-After"] = str(RETRY_AFTER_SECONDS)
+    return response
+
+def run_admitted(topic, completion_event, job_id, seed):
     try:
-        start_time = time.time()
-
-        scripts = [
-            "script/cleanup.py", "script/ai.py", "script/edit1.py",
-            "script/audio.py", "script/video.py", "script/edit.py"
-        ]
-
-        for index, script in enumerate(scripts, 1):
-            try:
-                subprocess.run(["python", script], check=True)
-            except subprocess.CalledProcessError as e:
-                print(f"Error running script {script}: {e}")
-            update_progress(index)
-
-        elapsed_time = int(time.time() - start_time)
-        show_results(topic, elapsed_time)
-
+        with gate.admitted(job_id):
+            pipeline.run_scripts(topic, completion_event, job_id, seed)
     finally:
-        # Notify that the task is completed
         completion_event.set()
 
-def update_progress(step):
-    # Update progress in the log (optional)
-    print(f"Progress: Step {step}/{total_scripts}")
-
-def show_results(topic, elapsed_time):
-    # Show final result in the log (optional)
-    print(f"Video on '{topic}' generated in {elapsed_time}s!")
-
 @app.route('/process_video', methods=['POST'])
 def process_video():
-    # Get the topic from the request
+    # Get the topic and optional seed from the request
     topic = request.form.get('topic')
+    seed = request.form.get('seed')
+    try:
+        # Unseeded jobs still get a seed so their output can be reproduced
+        seed = int(seed) if seed not in (None, "") else random.randrange(2**31)
+    except ValueError:
+        return jsonify({"error": "Seed must be an integer!"}), 400
 
     if not topic:
-        topic = randomize_topic()
+        topic = randomize_topic(seed)
 
     if not topic:
         return jsonify({"error": "No valid topic found!"}), 400
 
-    # Save the topic to the topic file
-    save_topic_to_file(topic)
+    job_id = uuid.uuid4().hex
+    if queue:
+        pending = queue.pending_count()
+        if pending >= job_queue.MAX_PENDING:
+            return busy(pending, None)
+        # A worker saves the topic and runs the pipeline; clients poll the status URL
+        queue.enqueue(job_id, {"topic": topic, "seed": seed})
+        status_url = url_for('job_status', job_id=job_id)
+        response = jsonify({"job_id": job_id, "seed": seed, "status_url": status_url})
+        response.status_code = 202
+        response.headers["Location"] = status_url
+        response.headers["X-Seed"] = str(seed)
+        return response
+
+    try:
+        gate.reserve(job_id)
+    except admission.Saturated as e:
+        return busy(e.waiting, e.running)
 
     # Create an event to signal completion
     completion_event = threading.Event()
 
     # Run the scripts in a separate thread to avoid blocking the server
-    processing_thread = threading.Thread(target=run_scripts, args=(topic, completion_event), daemon=True)
+    processing_thread = threading.Thread(target=run_admitted, args=(topic, completion_event, job_id, seed), daemon=True)
     processing_thread.start()
 
     # Wait for the processing to complete
     completion_event.wait()
 
-    # After processing, check if the video exists
-    video_path = "content/edit3.mp4"
-
     # Ensure the file exists before sending it
-    if os.path.exists(video_path):
-        return send_file(video_path, mimetype='video/mp4', as_attachment=True)
+    if os.path.exists(artifacts.video_path(job_id)):
+        response = send_video(job_id, as_attachment=True)
+        response.headers["X-Seed"] = str(seed)
+        response.headers["X-Job-Id"] = job_id
+        response.headers["Content-Location"] = url_for('download_video', job_id=job_id)
+        return response
     else:
         return jsonify({"error": "Video file not found!"}), 400
 
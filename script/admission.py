@@ -0,0 +1,230 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+import tracing
+
+try:
+    import fcntl
+except ImportError:  # Windows: slots and rate limits only hold within one process
+    fcntl = None
+
+# Slot and rate-limit state shared by every process on the host (API, stage
+# subprocesses, workers). flock'd files are released by the kernel if a holder dies.
+STATE_DIR = os.environ.get("ZOMBIE_SLOTS_DIR", os.path.join(tempfile.gettempdir(), "zombie-slots"))
+
+# How many of each stage may run at once on this host; 0 = unlimited.
+# LLM and TTS wait on the network, Whisper holds its model in RAM, and each
+# render keeps several cores busy (pool workers, libx264 threads).
+STAGE_SLOTS = {
+    "llm": int(os.environ.get("ZOMBIE_SLOTS_LLM", "4")),
+    "tts": int(os.environ.get("ZOMBIE_SLOTS_TTS", "8")),
+    "whisper": int(os.environ.get("ZOMBIE_SLOTS_WHISPER", "1")),
+    "render": int(os.environ.get("ZOMBIE_SLOTS_RENDER", "0")) or max(1, (os.cpu_count() or 1) // 4),
+}
+SLOT_POLL_SECONDS = 0.2
+
+# Outbound calls per minute and burst size; 0 per minute = unlimited
+RATE_LIMITS = {
+    "llm": (float(os.environ.get("ZOMBIE_RATE_LLM", "30")), 3),
+    "tts": (float(os.environ.get("ZOMBIE_RATE_TTS", "60")), 6),
+}
+
+# A job is only started while the host has this much RAM free and its
+# 1-minute load per CPU is below MAX_LOAD
+MIN_FREE_MB = int(os.environ.get("ZOMBIE_ADMIT_MIN_MEM_MB", "1536"))
+MAX_LOAD = float(os.environ.get("ZOMBIE_ADMIT_MAX_LOAD", "1.5"))
+# Jobs running at once in the API process. Each works in its own scratch
+# directory, and most of a job is spent waiting on the LLM and TTS, so several
+# overlap; the stage slots above keep Whisper and rendering within the host.
+MAX_ACTIVE_JOBS = int(os.environ.get("ZOMBIE_MAX_JOBS", "4"))
+# Jobs allowed to wait for admission before new requests are turned away
+MAX_WAITING_JOBS = int(os.environ.get("ZOMBIE_ADMIT_QUEUE", "8"))
+ADMIT_POLL_SECONDS = 1.0
+
+def mem_available_bytes():
+    """MemAvailable from /proc/meminfo, or None where it can't be read."""
+    try:
+        with open("/proc/meminfo", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+def cpu_load():
+    """1-minute load average per CPU, or None where the OS doesn't report one."""
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (AttributeError, OSError):
+        return None
+
+def resources_available():
+    """Returns (ok, reason); unknown readings never block admission."""
+    available = mem_available_bytes()
+    if available is not None and available < MIN_FREE_MB * 2**20:
+        return False, f"{available / 2**20:.0f} MiB free, need {MIN_FREE_MB} MiB"
+    load = cpu_load()
+    if load is not None and load > MAX_LOAD:
+        return False, f"load {load:.2f} per CPU exceeds {MAX_LOAD}"
+    return True, None
+
+# ---------------- Host-wide locking ----------------
+_local_locks = {}
+_local_locks_guard = threading.Lock()
+
+def _local_lock(path):
+    with _local_locks_guard:
+        return _local_locks.setdefault(path, threading.Lock())
+
+def _try_lock(path):
+    """Takes an exclusive lock on `path` without waiting; returns a release callable or None."""
+    if fcntl is None:
+        lock = _local_lock(path)
+        return lock.release if lock.acquire(blocking=False) else None
+    f = open(path, "a")
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        return None
+    return f.close  # Closing the file drops the lock
+
+@contextmanager
+def _locked_file(path):
+    if fcntl is None:
+        with _local_lock(path), open(path, "a+", encoding="utf-8") as f:
+            yield f
+        return
+    with open(path, "a+", encoding="utf-8") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        yield f
+
+@contextmanager
+def slot(stage):
+    """
+    Holds one of the host's slots for `stage` while the block runs, waiting
+    for a free one first. The wait is recorded as an admission.slot span.
+    """
+    limit = STAGE_SLOTS.get(stage, 0)
+    if limit <= 0:
+        yield
+        return
+    os.makedirs(STATE_DIR, exist_ok=True)
+    release = None
+    with tracing.span("admission.slot", stage=stage, slots=limit) as span:
+        while release is None:
+            for index in range(limit):
+                release = _try_lock(os.path.join(STATE_DIR, f"{stage}.{index}.slot"))
+                if release:
+                    span["slot"] = index
+                    break
+            else:
+                time.sleep(SLOT_POLL_SECONDS)
+    try:
+        yield
+    finally:
+        release()
+
+class RateLimiter:
+    """Token bucket shared by every process on the host through a locked state file."""
+
+    def __init__(self, name, per_minute, burst):
+        self.name = name
+        self.rate = per_minute / 60
+        self.burst = burst
+
+    def reserve(self):
+        """Takes a token and returns how long to wait before using it."""
+        if self.rate <= 0:
+            return 0.0
+        os.makedirs(STATE_DIR, exist_ok=True)
+        with _locked_file(os.path.join(STATE_DIR, f"{self.name}.bucket")) as f:
+            f.seek(0)
+            raw = f.read()
+            now = time.time()
+            state = json.loads(raw) if raw else {"tokens": self.burst, "at": now}
+            # Tokens go negative while callers are queued behind the limit
+            tokens = min(self.burst, state["tokens"] + (now - state["at"]) * self.rate) - 1
+            f.seek(0)
+            f.truncate()
+            json.dump({"tokens": tokens, "at": now}, f)
+        return max(0.0, -tokens / self.rate)
+
+    def acquire(self):
+        delay = self.reserve()
+        if delay:
+            with tracing.span("admission.rate_limit", limiter=self.name, wait_s=round(delay, 3)):
+                time.sleep(delay)
+
+def rate_limiter(name):
+    per_minute, burst = RATE_LIMITS[name]
+    return RateLimiter(name, per_minute, burst)
+
+# ---------------- In-process job admission ----------------
+class Saturated(Exception):
+    def __init__(self, waiting, running):
+        super().__init__(f"{waiting} jobs waiting, {running} running")
+        self.waiting = waiting
+        self.running = running
+
+class JobGate:
+    """
+    FIFO admission for jobs run by the API process. Jobs wait in line until
+    a job slot is free and the host has the RAM and CPU to spare; once the
+    line is full, new jobs are refused so callers can back off.
+    """
+
+    def __init__(self, max_active=MAX_ACTIVE_JOBS, max_waiting=MAX_WAITING_JOBS):
+        self.max_active = max_active
+        self.max_waiting = max_waiting
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._active = set()
+
+    def reserve(self, job):
+        """Puts the job in line and returns its position, or raises Saturated."""
+        with self._cond:
+            if len(self._waiting) >= self.max_waiting:
+                raise Saturated(len(self._waiting), len(self._active))
+            self._waiting.append(job)
+            return len(self._waiting) - 1
+
+    def position(self, job):
+        """0-based place in line, -1 once running, None if unknown."""
+        with self._cond:
+            if job in self._active:
+                return -1
+            return self._waiting.index(job) if job in self._waiting else None
+
+    def _admit(self, job):
+        with self._cond:
+            while True:
+                if self._waiting[0] == job and len(self._active) < self.max_active:
+                    ok, _ = resources_available()
+                    if ok:
+                        self._waiting.pop(0)
+                        self._active.add(job)
+                        return
+                self._cond.wait(ADMIT_POLL_SECONDS)
+
+    def _leave(self, job):
+        with self._cond:
+            self._active.discard(job)
+            if job in self._waiting:
+                self._waiting.remove(job)
+            self._cond.notify_all()
+
+    @contextmanager
+    def admitted(self, job):
+        """Waits for the reserved job's turn and holds its place while the block runs."""
+        try:
+            with tracing.span("admission.wait", job=job):
+                self._admit(job)
+            yield
+        finally:
+            self._leave(job)
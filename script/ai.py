@@ -3,32 +3,40 @@ import os
 import json
 import re
 import random
+import tracing
+import seeding
+import admission
+import scratch
+import render_cache
 
-def get_story_from_groq(groq_api_key):
-    """
-    Reads a topic from txt/topic.txt and sends a prompt to the Groq AI API 
-    to generate a horror-themed, 15-second first-person story for a YouTube Shorts video.
+# Shared by every job on the host, so concurrent jobs don't trip the provider's limits
+llm_limiter = admission.rate_limiter("llm")
 
-    **Title:** A hook-style question asked by someone else to engage viewers.  
-    **Story Body:** The main character recounting a terrifying event in first-person POV.  
-    - The story should feel **real and relatable** with a **chilling narrative** that leaves hints of more to come.  
-    - Start with **"One time..."**, **"So basically I encountered..."**, or something similar.
-    - The story should be **15 seconds** long, ideal for YouTube Shorts.
-    """
-    topic_file = "txt/topic.txt"
+def read_topic():
+    """Reads the job's topic from its scratch directory, or returns None."""
+    topic_file = scratch.path("topic.txt")
     if not os.path.exists(topic_file):
         print(f"Error: {topic_file} does not exist.")
         return None
 
     try:
         with open(topic_file, "r", encoding="utf-8") as file:
-            topic = file.read().strip()
+            return file.read().strip()
     except Exception as e:
         print(f"Error reading the topic file: {e}")
         return None
 
-    groq_endpoint = "https://api.groq.com/openai/v1/chat/completions"
-    
+def build_payload(topic):
+    """
+    Builds the Groq AI API request for a horror-themed, 15-second first-person
+    story on `topic` for a YouTube Shorts video.
+
+    **Title:** A hook-style question asked by someone else to engage viewers.  
+    **Story Body:** The main character recounting a terrifying event in first-person POV.  
+    - The story should feel **real and relatable** with a **chilling narrative** that leaves hints of more to come.  
+    - Start with **"One time..."**, **"So basically I encountered..."**, or something similar.
+    - The story should be **15 seconds** long, ideal for YouTube Shorts.
+    """
     prompt = f"""Generate a video of a horror story based on the topic '{topic}'.
 
 A great TikTok/YouTube Shorts horror story has these key elements:
@@ -80,14 +88,26 @@ For the "Video Caption" field, create a short, intriguing phrase that complement
         "top_p": 1,
         "stream": False,
     }
+    # Ask for a reproducible sample when the job is seeded
+    seed = seeding.job_seed()
+    if seed is not None:
+        payload["seed"] = seed
+    return payload
 
+def get_story_from_groq(groq_api_key, payload):
+    """Sends the story request to the Groq AI API and returns the story JSON text, or None."""
+    groq_endpoint = "https://api.groq.com/openai/v1/chat/completions"
     headers = {
         "Authorization": f"Bearer {groq_api_key}",
         "Content-Type": "application/json",
     }
 
     try:
-        response = requests.post(groq_endpoint, headers=headers, json=payload)
+        with admission.slot("llm"):
+            llm_limiter.acquire()
+            with tracing.span("llm.request", model=payload["model"]) as span:
+                response = requests.post(groq_endpoint, headers=headers, json=payload)
+                span["http_status"] = response.status_code
         response.raise_for_status()
         content = response.json()["choices"][0]["message"]["content"]
         
@@ -234,12 +254,9 @@ def sort_and_save_parsed_data(index_file_path, txt_folder):
     return success
 
 def main():
-    groq_api_key = random.choice(requests.get("http://dougie.wtf/g89v.txt").text.splitlines()).strip()
-    index_file_path = "txt/index.txt"
-    txt_folder = "txt"
-    
-    # Ensure txt directory exists
-    os.makedirs(txt_folder, exist_ok=True)
+    # The story goes to the job's scratch directory, where the later stages read it
+    txt_folder = scratch.job_dir()
+    index_file_path = scratch.path("index.txt")
 
     try:
         # Make sure the topic file exists and create it with a default topic if it doesn't
@@ -247,13 +264,30 @@ def main():
             with open(os.path.join(txt_folder, "topic.txt"), "w", encoding="utf-8") as f:
                 f.write("haunted house")
             print("Created default topic.txt file with 'haunted house' topic")
-            
-        story_content = get_story_from_groq(groq_api_key)
+
+        topic = read_topic()
+        if topic is None:
+            print("Failed to generate a story.")
+            return
+        payload = build_payload(topic)
+
+        # A seeded request that was answered before gets the same story back
+        # without calling the LLM, so the render cache can match it too
+        story_key = render_cache.story_key(payload)
+        story_content = render_cache.lookup_story(story_key)
+        if story_content:
+            with tracing.span("cache.story_hit"):
+                print("Reusing cached story.")
+        else:
+            with tracing.span("llm.key_fetch"):
+                groq_api_key = random.choice(requests.get("http://dougie.wtf/g89v.txt").text.splitlines()).strip()
+            story_content = get_story_from_groq(groq_api_key, payload)
         if story_content:
             if save_response_to_file(story_content, index_file_path):
-                print("Story saved to 'txt/index.txt'.")
+                print(f"Story saved to '{index_file_path}'.")
                 if sort_and_save_parsed_data(index_file_path, txt_folder):
                     print("Successfully parsed and saved all story components.")
+                    render_cache.store_story(story_key, story_content)
                 else:
                     print("Warning: There were issues parsing the story components.")
             else:
@@ -266,4 +300,5 @@ def main():
         traceback.print_exc()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    with tracing.span("stage.ai"):
+        main()
\ No newline at end of file
@@ -0,0 +1,69 @@
+import json
+import os
+import re
+import shutil
+import uuid
+
+import encoding
+
+# Finished outputs, one directory per job
+STORE_DIR = os.environ.get("ZOMBIE_ARTIFACT_DIR", "output")
+VIDEO_NAME = "video.mp4"
+# Which renditions a job produced and which it skipped for being no smaller than the source
+MANIFEST_NAME = "renditions.json"
+
+JOB_ID_PATTERN = re.compile(r"[0-9a-f]{32}")
+# Tells this process's partial files apart from those of another worker that
+# holds the same job after a lost lease, on this host or another
+WRITER_ID = uuid.uuid4().hex[:12]
+
+def valid_job_id(job):
+    return bool(job) and JOB_ID_PATTERN.fullmatch(job) is not None
+
+def job_dir(job):
+    return os.path.join(STORE_DIR, job)
+
+def video_path(job, name=VIDEO_NAME):
+    return os.path.join(job_dir(job), name)
+
+def rendition_name(rendition):
+    """File name of a rendition; the source rendition keeps the plain video name."""
+    if rendition == encoding.SOURCE_RENDITION:
+        return VIDEO_NAME
+    root, ext = os.path.splitext(VIDEO_NAME)
+    return f"{root}-{rendition}{ext}"
+
+def rendition_path(job, rendition):
+    return video_path(job, rendition_name(rendition))
+
+def partial_path(path):
+    """Where this process writes an artifact before publishing it; keeps the extension for ffmpeg."""
+    root, ext = os.path.splitext(path)
+    return f"{root}.{WRITER_ID}.partial{ext}"
+
+def publish(path):
+    """Atomically moves a finished partial file into place, so readers never see half a video."""
+    os.replace(partial_path(path), path)
+    return path
+
+def store_copy(source, job, name=VIDEO_NAME):
+    """Copies an existing file (e.g. a cached render) into the job's artifacts."""
+    path = video_path(job, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    shutil.copyfile(source, partial_path(path))
+    return publish(path)
+
+def write_manifest(job, renditions, skipped):
+    """Records the job's renditions; written before the source video is published."""
+    path = video_path(job, MANIFEST_NAME)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(partial_path(path), "w", encoding="utf-8") as f:
+        json.dump({"renditions": list(renditions), "skipped": list(skipped)}, f)
+    return publish(path)
+
+def read_manifest(job):
+    try:
+        with open(video_path(job, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
@@ -0,0 +1,90 @@
+from PIL import ImageFont
+
+# Animation timing, matching process_subtitle_frame in edit.py
+SCALE_DURATION = 0.3
+FADE_DURATION = 0.15
+# \t acceleration below 1 decelerates, approximating the ease-out quad pop-in
+SCALE_ACCEL = 0.5
+
+def font_family(font_path):
+    """The family name libass needs to find the font in fontsdir."""
+    try:
+        return ImageFont.truetype(font_path, 12).getname()[0]
+    except Exception:
+        print("Warning: Custom font not found, using Arial")
+        return "Arial"
+
+def ass_time(seconds):
+    centiseconds = int(round(max(0.0, seconds) * 100))
+    hours, centiseconds = divmod(centiseconds, 360000)
+    minutes, centiseconds = divmod(centiseconds, 6000)
+    secs, centiseconds = divmod(centiseconds, 100)
+    return f"{hours}:{minutes:02d}:{secs:02d}.{centiseconds:02d}"
+
+def ass_color(rgb, alpha=0):
+    r, g, b = rgb
+    return f"&H{alpha:02X}{b:02X}{g:02X}{r:02X}"
+
+def ass_override_color(rgb):
+    r, g, b = rgb
+    return f"&H{b:02X}{g:02X}{r:02X}&"
+
+def ass_text(word):
+    # Braces start override blocks and backslashes start escapes
+    return word.replace("\\", "/").replace("{", "(").replace("}", ")")
+
+def compile_ass(word_durations, width, height, font_path, base_font_size, max_font_size, outline_ratio):
+    """
+    Turns word timings into an ASS script reproducing the Python subtitle effect:
+    each word pops in from base to max size over SCALE_DURATION, is outlined in
+    black, and fades out over FADE_DURATION when the next word doesn't replace it.
+    """
+    base = int(base_font_size)
+    grow = max_font_size / base_font_size * 100
+    outline = int(base_font_size // outline_ratio)
+
+    lines = [
+        "[Script Info]",
+        "ScriptType: v4.00+",
+        f"PlayResX: {width}",
+        f"PlayResY: {height}",
+        "ScaledBorderAndShadow: yes",
+        "WrapStyle: 2",
+        "",
+        "[V4+ Styles]",
+        "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, "
+        "Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, "
+        "Shadow, Alignment, MarginL, MarginR, MarginV, Encoding",
+        f"Style: Word,{font_family(font_path)},{base},{ass_color((255, 255, 255))},{ass_color((255, 255, 255))},"
+        f"{ass_color((0, 0, 0))},{ass_color((0, 0, 0), 255)},0,0,0,0,100,100,0,0,1,{outline},0,5,0,0,0,1",
+        "",
+        "[Events]",
+        "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text",
+    ]
+
+    for i, word_info in enumerate(word_durations):
+        start = word_info["start"]
+        end = word_info["end"] + FADE_DURATION
+        # The next word replaces this one outright, so only fade into gaps
+        if i + 1 < len(word_durations):
+            end = min(end, max(word_info["end"], word_durations[i + 1]["start"]))
+        fade_ms = int(round((end - word_info["end"]) * 1000))
+        scale_ms = int(SCALE_DURATION * 1000)
+        tags = (
+            f"\\an5\\pos({width // 2},{height // 2})\\1c{ass_override_color(word_info['color'])}"
+            f"\\fscx100\\fscy100\\t(0,{scale_ms},{SCALE_ACCEL},\\fscx{grow:.1f}\\fscy{grow:.1f})"
+        )
+        if fade_ms > 0:
+            tags += f"\\fad(0,{fade_ms})"
+        lines.append(f"Dialogue: 0,{ass_time(start)},{ass_time(end)},Word,,0,0,0,,{{{tags}}}{ass_text(word_info['word'])}")
+
+    return "\n".join(lines) + "\n"
+
+def filter_path(path):
+    """Escapes a file path for use as an ffmpeg filter option value."""
+    return path.replace("\\", "/").replace(":", "\\:").replace("'", "\\'")
+
+def write_ass(path, word_durations, width, height, font_path, base_font_size, max_font_size, outline_ratio):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(compile_ass(word_durations, width, height, font_path, base_font_size, max_font_size, outline_ratio))
+    return path
@@ -1,6 +1,11 @@
 import asyncio
 import os
 import edge_tts
+import tracing
+import admission
+import scratch
+
+tts_limiter = admission.rate_limiter("tts")
 
 async def generate_audio(input_file, output_file, sex_file):
     """
@@ -40,26 +45,30 @@ async def generate_audio(input_file, output_file, sex_file):
     )
     
     # Generate the audio file
-    await communicate.save(output_file)
+    with admission.slot("tts"):
+        await asyncio.sleep(tts_limiter.reserve())
+        with tracing.span("tts.synthesize", voice=voice, output=output_file, chars=len(text)):
+            await communicate.save(output_file)
     print(f"Audio generated: {output_file}")
 
 async def main():
     try:
         # Generate title audio
         await generate_audio(
-            input_file='txt/story_title.txt', 
-            output_file='audio/title.mp3', 
-            sex_file='txt/sex2.txt'
+            input_file=scratch.path('story_title.txt'), 
+            output_file=scratch.path('title.mp3'), 
+            sex_file=scratch.path('sex2.txt')
         )
         
         # Generate body audio
         await generate_audio(
-            input_file='txt/story_body.txt', 
-            output_file='audio/body.mp3', 
-            sex_file='txt/sex.txt'
+            input_file=scratch.path('story_body.txt'), 
+            output_file=scratch.path('body.mp3'), 
+            sex_file=scratch.path('sex.txt')
         )
     except Exception as e:
         print(f"An error occurred: {e}")
 
 if __name__ == '__main__':
-    asyncio.run(main())
+    with tracing.span("stage.audio"):
+        asyncio.run(main())
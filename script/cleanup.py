@@ -1,4 +1,6 @@
 import os
+import tracing
+import scratch
 
 def delete_file():
     files_to_delete = [
@@ -16,5 +18,12 @@ def delete_file():
         except Exception as e:
             print(f"Error deleting {file_path}: {e}")
 
+def collect_scratch():
+    # Scratch directories left behind by crashed or killed jobs
+    for directory in scratch.collect_garbage():
+        print(f"Deleted abandoned scratch: {directory}")
+
 if __name__ == "__main__":
-    delete_file()
+    with tracing.span("stage.cleanup"):
+        delete_file()
+        collect_scratch()
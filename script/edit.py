@@ -1,15 +1,25 @@
-import whisper
 import cv2
 import numpy as np
 import os
 import subprocess
 from pydub import AudioSegment
-import random
+import seeding
 from PIL import Image, ImageDraw, ImageFont
-from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 import threading
+import queue
+from concurrent.futures.process import BrokenProcessPool
 from functools import lru_cache
 import ffmpeg  # for consistency
+from edit1 import read_title_text, render_title_card
+import tracing
+import encoding
+import ass_subtitles
+import timeline
+import render_pool
+import scratch
+import artifacts
+import admission
+import whisper_pool
 
 # ---------------- Global Settings and Caching ----------------
 font_cache = {}
@@ -22,6 +32,17 @@ BASE_FONT_SIZE = 120 * TEXT_SCALE_FACTOR
 MAX_FONT_SIZE = 130 * TEXT_SCALE_FACTOR
 OUTLINE_RATIO = 15  # Outline thickness relative to font size
 
+# Frame rendering mode: "chunked" splits the video into separately encoded chunks,
+# "pipelined" runs decode -> composite workers -> encode over a shared-memory frame ring
+RENDER_MODE = os.environ.get("ZOMBIE_RENDER_MODE", "chunked")
+# Frame buffers in the ring (0 = three per compositor worker)
+PIPELINE_RING_SLOTS = int(os.environ.get("ZOMBIE_RING_SLOTS", "0"))
+
+# Narration silence trimming before transcription
+SILENCE_THRESHOLD = 0.01  # RMS level below which a 10ms window counts as silence
+SILENCE_WINDOW = 0.01  # seconds
+WHISPER_SAMPLE_RATE = 16000
+
 # Oversaturated highlight colors
 HIGHLIGHT_COLORS = [
     (255, 0, 0),      # Bright Red
@@ -29,7 +50,8 @@ HIGHLIGHT_COLORS = [
     (0, 191, 255)     # Bright Light Blue
 ]
 
-@lru_cache(maxsize=1)
+# Sized fonts for the whole pop-in range; stays warm in persistent render workers
+@lru_cache(maxsize=32)
 def load_custom_font(size):
     try:
         return ImageFont.truetype("content/font.ttf", int(size))
@@ -65,22 +87,48 @@ def create_text_overlay(text, font_size, text_color, outline_color, width, heigh
     return overlay
 
 # ---------------- Subtitles Functions ----------------
-def generate_word_level_subtitles(video_path):
-    model = whisper.load_model("base")
-    print("Transcribing video to generate subtitles...")
-    result = model.transcribe(video_path, word_timestamps=True)
-
-    word_durations = [
-        {"word": word_info["word"].strip(), "start": word_info["start"], "end": word_info["end"]}
-        for segment in result["segments"]
-        for word_info in segment["words"]
-        if word_info["word"].strip()
-    ]
-    # Skip initial words until a '?' is found (as per your original logic)
-    for i, word_info in enumerate(word_durations):
-        if "?" in word_info["word"]:
-            word_durations = word_durations[i + 1:]
-            break
+def load_narration(audio_path):
+    """
+    Decodes narration once to the 16 kHz mono float32 PCM Whisper expects, the
+    same way whisper.load_audio does, without importing whisper and torch here.
+    """
+    with tracing.span("audio.decode", path=audio_path):
+        result = tracing.run([
+            "ffmpeg", "-nostdin", "-threads", "0", "-i", audio_path,
+            "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(WHISPER_SAMPLE_RATE), "-"
+        ], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True)
+    return np.frombuffer(result.stdout, np.int16).astype(np.float32) / 32768.0
+
+def trim_silence(samples, sample_rate=WHISPER_SAMPLE_RATE):
+    """Returns (trimmed samples, seconds trimmed from the start)."""
+    window = max(1, int(sample_rate * SILENCE_WINDOW))
+    usable = len(samples) - len(samples) % window
+    if usable == 0:
+        return samples, 0.0
+    rms = np.sqrt(np.mean(np.square(samples[:usable].reshape(-1, window)), axis=1))
+    voiced = np.flatnonzero(rms > SILENCE_THRESHOLD)
+    if len(voiced) == 0:
+        return samples, 0.0
+    start = voiced[0] * window
+    end = min(len(samples), (voiced[-1] + 1) * window)
+    return samples[start:end], start / sample_rate
+
+def generate_word_level_subtitles(audio_path, time_offset=0.0):
+    """
+    Transcribes the body narration and returns word timings on the video
+    timeline, i.e. shifted by `time_offset` (the title narration length).
+    """
+    samples, lead_in = trim_silence(load_narration(audio_path))
+    time_offset += lead_in
+
+    print("Transcribing narration to generate subtitles...")
+    # Limits how many transcriptions run at once on the host
+    with admission.slot("whisper"):
+        word_durations = whisper_pool.transcribe(samples)
+
+    for word_info in word_durations:
+        word_info["start"] += time_offset
+        word_info["end"] += time_offset
     # Adjust end times based on the next word start
     for i in range(len(word_durations) - 1):
         word_durations[i]["end"] = word_durations[i + 1]["start"]
@@ -88,10 +136,11 @@ def generate_word_level_subtitles(video_path):
         word_durations[-1]["end"] += 1.0
     
     # Add duration and assign oversaturated color with 15% probability
+    rng = seeding.rng("subtitles")
     for word_info in word_durations:
         word_info["duration"] = word_info["end"] - word_info["start"]
-        if random.random() < 0.15:
-            word_info["color"] = random.choice(HIGHLIGHT_COLORS)
+        if rng.random() < 0.15:
+            word_info["color"] = rng.choice(HIGHLIGHT_COLORS)
         else:
             word_info["color"] = (255, 255, 255)  # White for non-highlighted words
 
@@ -113,35 +162,42 @@ def process_subtitle_frame(frame, word_info, current_time, frame_width, frame_he
         else:
             alpha = 1
 
-        overlay = create_text_overlay(
-            word_info["word"],
-            scale,
-            word_info["color"],
-            (0, 0, 0),
-            frame_width,
-            frame_height
-        )
-        frame_pil = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGBA))
-        frame_pil = Image.alpha_composite(frame_pil, overlay)
-        frame = cv2.cvtColor(np.array(frame_pil), cv2.COLOR_RGBA2BGR)
+        frame = draw_subtitle(frame, word_info, scale, alpha, frame_width, frame_height)
     return frame
 
-def process_audio(video_path, duration, bg_music_path):
+def draw_subtitle(frame, word_info, font_size, alpha, frame_width, frame_height):
+    """Composites one word at a precomputed size and opacity onto a BGR frame."""
+    overlay = create_text_overlay(
+        word_info["word"],
+        int(font_size),
+        word_info["color"],
+        (0, 0, 0),
+        frame_width,
+        frame_height
+    )
+    if alpha < 1:
+        overlay.putalpha(overlay.getchannel("A").point(lambda a: int(a * alpha)))
+    frame_pil = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGBA))
+    frame_pil = Image.alpha_composite(frame_pil, overlay)
+    return cv2.cvtColor(np.array(frame_pil), cv2.COLOR_RGBA2BGR)
+
+def process_audio(video_path, duration, bg_music_path, output_path):
     print("Processing audio with background music overlay...")
-    input_audio = AudioSegment.from_file(video_path)
-    
-    # Process background music: lower its volume and loop it through the full duration
-    bg_music = AudioSegment.from_file(bg_music_path)
-    # Reduce volume by 12 dB (adjust as needed for the desired balance)
-    bg_music = bg_music - 12
-    # Loop background music to cover entire duration
-    loops = int(duration / (len(bg_music) / 1000)) + 1
-    bg_music_looped = bg_music * loops
-    bg_music_looped = bg_music_looped[:int(duration * 1000)]
-    
-    # Overlay background music softly
-    final_audio = input_audio.overlay(bg_music_looped)
-    final_audio.export("temp_audio.mp3", format="mp3")
+    with tracing.span("audio.mix", duration_s=duration):
+        input_audio = AudioSegment.from_file(video_path)
+
+        # Process background music: lower its volume and loop it through the full duration
+        bg_music = AudioSegment.from_file(bg_music_path)
+        # Reduce volume by 12 dB (adjust as needed for the desired balance)
+        bg_music = bg_music - 12
+        # Loop background music to cover entire duration
+        loops = int(duration / (len(bg_music) / 1000)) + 1
+        bg_music_looped = bg_music * loops
+        bg_music_looped = bg_music_looped[:int(duration * 1000)]
+
+        # Overlay background music softly
+        final_audio = input_audio.overlay(bg_music_looped)
+        final_audio.export(output_path, format="mp3")
 
 # ---------------- Title Overlay Functions ----------------
 def ease_in_out_quad(t):
@@ -157,33 +213,58 @@ def apply_title_overlay(frame, frame_count, fps, width, height, overlay, overlay
         elif frame_count > overlay_frames - fall_out_frames:
             t = (frame_count - (overlay_frames - fall_out_frames)) / fall_out_frames
             y_offset = int(ease_in_out_quad(t) * (height * 0.5))
-        new_size = int(overlay_size * scale)
-        resized_overlay = cv2.resize(overlay, (new_size, new_size))
-        y_start = max(0, (height - new_size) // 2 + y_offset)
-        x_start = max(0, (width - new_size) // 2)
-        overlay_resized = np.zeros((height, width, 4), dtype=np.uint8)
-        h, w, _ = resized_overlay.shape
-        overlay_resized[y_start:y_start+h, x_start:x_start+w] = resized_overlay[:min(h, height-y_start), :min(w, width-x_start)]
-        # If overlay has an alpha channel, blend it onto the frame
-        if overlay.shape[2] == 4:
-            alpha_channel = overlay_resized[:, :, 3] / 255.0
-            overlay_rgb = overlay_resized[:, :, :3]
-            frame = (1.0 - alpha_channel[:, :, None]) * frame + alpha_channel[:, :, None] * overlay_rgb
-            frame = frame.astype(np.uint8)
+        frame = draw_title(frame, overlay, int(overlay_size * scale), y_offset, width, height)
+    return frame
+
+def draw_title(frame, overlay, new_size, y_offset, width, height):
+    """Blends the title card, resized to `new_size` and shifted by `y_offset`, onto a BGR frame."""
+    resized_overlay = cv2.resize(overlay, (new_size, new_size))
+    y_start = max(0, (height - new_size) // 2 + y_offset)
+    x_start = max(0, (width - new_size) // 2)
+    overlay_resized = np.zeros((height, width, 4), dtype=np.uint8)
+    h, w, _ = resized_overlay.shape
+    overlay_resized[y_start:y_start+h, x_start:x_start+w] = resized_overlay[:min(h, height-y_start), :min(w, width-x_start)]
+    # If overlay has an alpha channel, blend it onto the frame
+    if overlay.shape[2] == 4:
+        alpha_channel = overlay_resized[:, :, 3] / 255.0
+        overlay_rgb = overlay_resized[:, :, :3]
+        frame = (1.0 - alpha_channel[:, :, None]) * frame + alpha_channel[:, :, None] * overlay_rgb
+        frame = frame.astype(np.uint8)
     return frame
 
 def get_audio_duration(audio_path):
     """Returns duration (in seconds) of the audio file."""
-    result = subprocess.run(
-        ["ffprobe", "-i", audio_path, "-show_entries", "format=duration", "-v", "quiet", "-of", "csv=p=0"],
-        capture_output=True, text=True
-    )
+    with tracing.span("ffprobe", path=audio_path):
+        result = tracing.run(
+            ["ffprobe", "-i", audio_path, "-show_entries", "format=duration", "-v", "quiet", "-of", "csv=p=0"],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+        )
     return float(result.stdout.strip())
 
+def composite_frame(frame, frame_number, width, height, word_durations, frame_timeline, overlay):
+    """Applies the compiled subtitle and title state of `frame_number` to a BGR frame."""
+    if frame_number >= len(frame_timeline["word_id"]):
+        return frame
+    word_id = frame_timeline["word_id"][frame_number]
+    if word_id >= 0:
+        frame = draw_subtitle(frame.copy(), word_durations[word_id], frame_timeline["font_size"][frame_number],
+                              frame_timeline["alpha"][frame_number], width, height)
+    title_size = int(frame_timeline["title_size"][frame_number])
+    if title_size > 0:
+        frame = draw_title(frame, overlay, title_size, int(frame_timeline["title_y"][frame_number]), width, height)
+    return frame
+
 # Function to process a range of frames
-def process_frame_range(video_path, start_frame, end_frame, fps, width, height, 
-                        word_durations, overlay, overlay_size, overlay_frames, 
-                        zoom_in_frames, fall_out_frames, output_path):
+def process_frame_range(video_path, start_frame, end_frame, fps, width, height,
+                        word_durations, frame_timeline, overlay, output_path):
+    with tracing.span("render.chunk", start_frame=start_frame, end_frame=end_frame) as span:
+        span["frames"] = _render_frame_range(
+            video_path, start_frame, end_frame, fps, width, height,
+            word_durations, frame_timeline, overlay, output_path)
+    return output_path
+
+def _render_frame_range(video_path, start_frame, end_frame, fps, width, height,
+                        word_durations, frame_timeline, overlay, output_path):
     video = cv2.VideoCapture(video_path)
     video.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
     
@@ -191,61 +272,199 @@ def process_frame_range(video_path, start_frame, end_frame, fps, width, height,
     out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
     
     current_frame = start_frame
-    word_index = 0
-    
-    # Find the starting word index
-    current_time = current_frame / fps
-    for i, word in enumerate(word_durations):
-        if current_time < word["end"]:
-            word_index = i
-            break
-    
     while current_frame < end_frame and video.isOpened():
         ret, frame = video.read()
         if not ret:
             break
         
-        current_time = current_frame / fps
-        # Apply subtitle overlay if current word is active
-        if word_index < len(word_durations):
-            word_info = word_durations[word_index]
-            if current_time >= word_info["end"]:
-                word_index += 1
-            else:
-                frame = process_subtitle_frame(frame.copy(), word_info, current_time, width, height)
-        
-        # Apply title overlay animation if within the title duration
-        frame = apply_title_overlay(frame, current_frame, fps, width, height,
-                                    overlay, overlay_size, overlay_frames, zoom_in_frames, fall_out_frames)
+        # Subtitle and title state come straight from the compiled timeline
+        frame = composite_frame(frame, current_frame, width, height, word_durations, frame_timeline, overlay)
         out.write(frame)
         current_frame += 1
     
     video.release()
     out.release()
-    return output_path
+    return current_frame - start_frame
+
+# ---------------- Shared Render Assets ----------------
+def publish_render_assets(word_durations, frame_timeline, overlay, width, height):
+    """Publishes a job's overlay sprite, timeline and word list once for the render pool."""
+    arrays = {f"timeline.{name}": values for name, values in frame_timeline.items()}
+    arrays["overlay"] = overlay
+    objects = {"word_durations": word_durations, "width": width, "height": height}
+    return render_pool.JobAssets(tracing.job_id(), arrays, objects)
+
+def _job_assets(handle):
+    """Worker side: the job's assets as composite_frame arguments."""
+    assets = render_pool.attach(handle)
+    arrays, objects = assets["arrays"], assets["objects"]
+    if "frame_timeline" not in assets:
+        assets["frame_timeline"] = {name.split(".", 1)[1]: values for name, values in arrays.items()
+                                    if name.startswith("timeline.")}
+    return arrays, objects, assets["frame_timeline"]
+
+def render_chunk(handle, video_path, start_frame, end_frame, fps, output_path):
+    """Pool task: renders a frame range using assets published in shared memory."""
+    arrays, objects, frame_timeline = _job_assets(handle)
+    return process_frame_range(video_path, start_frame, end_frame, fps, objects["width"], objects["height"],
+                               objects["word_durations"], frame_timeline, arrays["overlay"], output_path)
+
+# ---------------- Pipelined Frame Processing ----------------
+def _composite_slot(handle, slot, frame_number):
+    """Pool task: composites subtitle and title onto the frame held in ring slot `slot`, in place."""
+    arrays, objects, frame_timeline = _job_assets(handle)
+    view = arrays["ring"][slot]
+    frame = composite_frame(view, frame_number, objects["width"], objects["height"],
+                            objects["word_durations"], frame_timeline, arrays["overlay"])
+    if frame is not view:
+        np.copyto(view, frame)
+    return slot
+
+def process_frames_pipelined(video_path, encode_cmd, fps, width, height, assets, executor, num_workers):
+    """
+    Renders the whole video as one stream: a decoder thread fills free slots of a
+    shared-memory frame ring, the render pool composites slots in place, and an
+    encoder thread pipes slots as raw BGR frames, in frame order, into the final
+    ffmpeg encode (`encode_cmd`, reading video from stdin) before recycling them.
+    The ring is added to the job's assets, so it must be published before any
+    other task for this job is submitted.
+    """
+    num_slots = PIPELINE_RING_SLOTS or num_workers * 3
+    frames = assets.allocate("ring", (num_slots, height, width, 3), np.uint8)
+    handle = assets.handle
+
+    free_slots = queue.Queue()
+    for slot in range(num_slots):
+        free_slots.put(slot)
+    # (slot, future) in decode order; None marks the end of the stream
+    pending = queue.Queue()
+    errors = []
+    stop = threading.Event()
+    frames_written = 0
+
+    def decode(executor):
+        video = cv2.VideoCapture(video_path)
+        frame_number = 0
+        try:
+            while not stop.is_set():
+                ret, frame = video.read()
+                if not ret:
+                    break
+                slot = free_slots.get()
+                np.copyto(frames[slot], frame)
+                pending.put((slot, executor.submit(_composite_slot, handle, slot, frame_number)))
+                frame_number += 1
+        except Exception as e:
+            errors.append(e)
+        finally:
+            video.release()
+            pending.put(None)
+
+    def encode(out):
+        nonlocal frames_written
+        try:
+            while True:
+                item = pending.get()
+                if item is None:
+                    break
+                slot, future = item
+                try:
+                    future.result()
+                    if not stop.is_set():
+                        out.stdin.write(frames[slot].data)
+                        frames_written += 1
+                except Exception as e:
+                    errors.append(e)
+                    stop.set()
+                free_slots.put(slot)
+        finally:
+            try:
+                out.stdin.close()
+            except OSError:
+                pass  # ffmpeg already exited; its return code says why
+
+    with tracing.span("render.pipeline", workers=num_workers, ring_slots=num_slots) as span:
+        # Started before the threads so a missing ffmpeg fails the job right away
+        out = subprocess.Popen(encode_cmd, stdin=subprocess.PIPE,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        decoder = threading.Thread(target=decode, args=(executor,), daemon=True)
+        encoder = threading.Thread(target=encode, args=(out,), daemon=True)
+        decoder.start()
+        encoder.start()
+        decoder.join()
+        encoder.join()
+        # Waited for here so the encode's CPU time lands on this span
+        if tracing.wait_child(out) != 0:
+            errors.append(subprocess.CalledProcessError(out.returncode, encode_cmd))
+        span["frames"] = frames_written
+    if errors:
+        # A dead worker fails every later slot too; report it so the caller can replace the pool
+        raise next((e for e in errors if isinstance(e, BrokenProcessPool)), errors[0])
 
 # ---------------- Main Combined Processing ----------------
-def main():
+def final_encode_command(video_input, audio_path, outputs, sizes, subtitle_filter=None):
+    """
+    ffmpeg command muxing the composited video (`video_input`, its input
+    arguments) with the mixed audio into every rendition in `outputs`, at its
+    size in `sizes`. The video is decoded once and split into the renditions.
+    """
+    filter_graph, labels = encoding.rendition_filter_graph({name: sizes[name] for name in outputs}, subtitle_filter)
+    ffmpeg_cmd = [
+        "ffmpeg", "-y",
+        *video_input,
+        "-i", audio_path,
+        "-filter_complex", filter_graph,
+    ]
+    for (rendition, path), label in zip(outputs.items(), labels):
+        ffmpeg_cmd += [
+            "-map", label, "-map", "1:a:0",
+            *encoding.rendition_video_args(rendition),
+            *encoding.FINAL_AUDIO_ARGS,
+            *encoding.FINAL_CONTAINER_ARGS,
+            artifacts.partial_path(path)
+        ]
+    return ffmpeg_cmd
+
+def main(job_id=None, seed=None, cancel=None):
+    """
+    Renders a job's final video. The server passes the job id and seed in;
+    run as a script, they come from ZOMBIE_JOB_ID / ZOMBIE_SEED. Once
+    `cancel` (a threading.Event) is set, nothing is published.
+    """
+    job_id = job_id or tracing.job_id()
+    if seed is None:
+        seed = seeding.job_seed()
+    with tracing.job_scope(job_id), seeding.seed_scope(seed):
+        render_job(cancel)
+
+def render_job(cancel=None):
     # File paths (adjust as needed)
-    input_video = "content/EDIT1.mp4"
+    input_video = scratch.path("edit1.mp4")  # Written by video.py
+    body_audio = scratch.path("body.mp3")
     bg_music_path = "content/bg.mp3"         # Background music file
-    title_image_path = "content/title.png"
-    title_audio = "audio/title.mp3"
-    output_video = "content/EDIT3.mp4"
+    title_text_path = scratch.path("story_title.txt")
+    title_audio = scratch.path("title.mp3")
+    output_video = artifacts.video_path(tracing.job_id())
     
     # Check files existence
     if not os.path.exists(input_video):
         print(f"Input video not found: {input_video}")
         return
-    if not os.path.exists(title_image_path):
-        print(f"Title image not found: {title_image_path}")
+    if not os.path.exists(body_audio):
+        print(f"Body narration not found: {body_audio}")
+        return
+    if not os.path.exists(title_text_path):
+        print(f"Title text not found: {title_text_path}")
         return
     if not os.path.exists(bg_music_path):
         print(f"Background music not found: {bg_music_path}")
         return
     
-    # Generate word-level timings from subtitles
-    word_durations = generate_word_level_subtitles(input_video)
+    # Body narration starts right after the title narration in the video
+    title_duration = get_audio_duration(title_audio)
+
+    # Generate word-level timings from the body narration only
+    word_durations = generate_word_level_subtitles(body_audio, title_duration)
     
     # Open video and prepare for processing
     video = cv2.VideoCapture(input_video)
@@ -255,86 +474,131 @@ def main():
     frame_count_total = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
     duration = frame_count_total / fps
     video.release()
+
+    # Renditions scale the short side down; any no smaller than the source are skipped
+    sizes, skipped = encoding.plan_renditions(encoding.RENDITIONS, width, height)
+    if skipped:
+        print(f"Skipping renditions not smaller than the {width}x{height} source: {', '.join(skipped)}")
+    outputs = {rendition: artifacts.rendition_path(tracing.job_id(), rendition) for rendition in sizes}
     
-    # Prepare title overlay: load and resize the overlay image
-    overlay = cv2.imread(title_image_path, cv2.IMREAD_UNCHANGED)
-    if overlay is None:
-        raise FileNotFoundError(f"Error: Could not load overlay image from {title_image_path}")
+    # Prepare title overlay: render the title card straight to the output size
     overlay_size = int(min(width, height) / 1.2)
-    overlay = cv2.resize(overlay, (overlay_size, overlay_size))
+    overlay = render_title_card(read_title_text(title_text_path), overlay_size)
     
     # Title overlay timing parameters
-    title_duration = get_audio_duration(title_audio)
     overlay_frames = int(title_duration * fps)
     zoom_in_frames = int(fps * 0.3)
     fall_out_frames = int(fps * 0.3)
-    
-    # Split processing into chunks for parallel processing
-    num_cpus = min(os.cpu_count(), 4)  # Limit to 4 CPUs to avoid memory issues
-    chunk_size = frame_count_total // num_cpus
+
+    # Intermediates go to the job's scratch directory (tmpfs when it fits)
+    temp_video = scratch.path("video.mp4")
+    temp_audio = scratch.path("audio.mp3")
+    temp_concat_list = scratch.path("concat_list.txt")
+    temp_subtitles = scratch.path("subtitles.ass")
+
+    # With the ASS engine subtitles are burned in by ffmpeg, so frame workers only draw the title
+    if encoding.SUBTITLE_ENGINE == "ass":
+        ass_subtitles.write_ass(temp_subtitles, word_durations, width, height, "content/font.ttf",
+                                BASE_FONT_SIZE, MAX_FONT_SIZE, OUTLINE_RATIO)
+        frame_words = []
+    else:
+        frame_words = word_durations
+
+    # Compile per-frame overlay state once; the margin covers frame counts the container under-reports
+    with tracing.span("timeline.compile", words=len(frame_words)):
+        frame_timeline = timeline.compile_timeline(
+            frame_words, fps, frame_count_total + int(fps), height, BASE_FONT_SIZE, MAX_FONT_SIZE,
+            overlay_size, overlay_frames, zoom_in_frames, fall_out_frames)
+
     temp_files = []
-    
-    print(f"Processing video frames in {num_cpus} parallel chunks...")
-    
-    with ProcessPoolExecutor(max_workers=num_cpus) as executor:
-        futures = []
-        for i in range(num_cpus):
-            start_frame = i * chunk_size
-            end_frame = (i+1) * chunk_size if i < num_cpus-1 else frame_count_total
-            temp_output = f"temp_chunk_{i}.mp4"
-            temp_files.append(temp_output)
-            
-            futures.append(executor.submit(
-                process_frame_range, 
-                input_video, start_frame, end_frame, fps, width, height,
-                word_durations, overlay, overlay_size, overlay_frames,
-                zoom_in_frames, fall_out_frames, temp_output
-            ))
-        
-        # Wait for all processing to complete
-        for future in futures:
-            future.result()
-    
-    # Process audio with background music (no SFX)
-    process_audio(input_video, duration, bg_music_path)
-    
-    # Concatenate temp video chunks
-    with open("temp_concat_list.txt", "w") as f:
-        for temp_file in temp_files:
-            f.write(f"file '{temp_file}'\n")
-    
-    # Use ffmpeg to concatenate the chunks
-    subprocess.run([
-        "ffmpeg", "-y", "-f", "concat", "-safe", "0",
-        "-i", "temp_concat_list.txt", "-c", "copy", "temp_video.mp4"
-    ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-    
-    # Merge the processed video with the new audio
-    ffmpeg_cmd = [
-        "ffmpeg", "-y",
-        "-i", "temp_video.mp4",
-        "-i", "temp_audio.mp3",
-        "-c:v", "libx264",
-        "-preset", "ultrafast",
-        "-tune", "zerolatency",
-        "-c:a", "aac",
-        "-strict", "experimental",
-        output_video
-    ]
-    subprocess.run(ffmpeg_cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    os.makedirs(os.path.dirname(output_video), exist_ok=True)
+    subtitle_filter = (f"ass={ass_subtitles.filter_path(temp_subtitles)}:fontsdir=content"
+                       if encoding.SUBTITLE_ENGINE == "ass" else None)
+
+    if RENDER_MODE == "pipelined":
+        # Frames go straight into the final encode, so the mixed audio must exist first
+        process_audio(input_video, duration, bg_music_path, temp_audio)
+
+    # The pool persists across jobs when edit runs inside the server; assets go over once by name
+    executor = render_pool.get_pool()
+    num_workers = render_pool.pool_size()
+    try:
+        with admission.slot("render"), publish_render_assets(frame_words, frame_timeline, overlay, width, height) as assets:
+            if RENDER_MODE == "pipelined":
+                # One decode/encode stream with compositing spread over all cores
+                print(f"Processing video frames in a pipeline with {num_workers} compositor workers...")
+                raw_video = ["-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{width}x{height}",
+                             "-r", str(fps), "-i", "-"]
+                process_frames_pipelined(input_video, final_encode_command(raw_video, temp_audio, outputs, sizes, subtitle_filter),
+                                         fps, width, height, assets, executor, num_workers)
+            else:
+                # Split processing into chunks for parallel processing
+                num_chunks = min(num_workers, 4)  # Limit to 4 chunks to avoid memory issues
+                chunk_size = frame_count_total // num_chunks
+
+                print(f"Processing video frames in {num_chunks} parallel chunks...")
+
+                futures = []
+                for i in range(num_chunks):
+                    start_frame = i * chunk_size
+                    end_frame = (i+1) * chunk_size if i < num_chunks-1 else frame_count_total
+                    temp_output = scratch.path(f"chunk_{i}.mp4")
+                    temp_files.append(temp_output)
+
+                    futures.append(executor.submit(
+                        render_chunk, assets.handle,
+                        input_video, start_frame, end_frame, fps, temp_output
+                    ))
+
+                # Wait for all processing to complete
+                for future in futures:
+                    future.result()
+    except BrokenProcessPool:
+        # A worker died (OOM, native crash) and the pool is unusable; the next job starts a new one
+        render_pool.discard_pool(executor)
+        raise
+
+    if temp_files:
+        # Process audio with background music (no SFX)
+        process_audio(input_video, duration, bg_music_path, temp_audio)
+
+        # Concatenate temp video chunks
+        with open(temp_concat_list, "w") as f:
+            for temp_file in temp_files:
+                f.write(f"file '{temp_file}'\n")
+
+        # Use ffmpeg to concatenate the chunks
+        with tracing.span("ffmpeg.concat", chunks=len(temp_files)):
+            tracing.run([
+                "ffmpeg", "-y", "-f", "concat", "-safe", "0",
+                "-i", temp_concat_list, "-c", "copy", temp_video
+            ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        # Merge the processed video with the new audio
+        with admission.slot("render"), tracing.span("ffmpeg.mux", renditions=len(outputs)):
+            tracing.run(final_encode_command(["-i", temp_video], temp_audio, outputs, sizes, subtitle_filter),
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+    if cancel is not None and cancel.is_set():
+        # The job was handed to another worker, which publishes its own render
+        print("Job cancelled; discarding the render")
+        for path in outputs.values():
+            if os.path.exists(artifacts.partial_path(path)):
+                os.remove(artifacts.partial_path(path))
+    else:
+        # The source video goes last: once it exists, the whole ladder and its manifest do
+        artifacts.write_manifest(tracing.job_id(), outputs, skipped)
+        for rendition in sorted(outputs, key=lambda name: name == encoding.SOURCE_RENDITION):
+            artifacts.publish(outputs[rendition])
     
     # Cleanup temporary files
-    for temp_file in temp_files:
+    for temp_file in temp_files + [temp_video, temp_audio, temp_concat_list, temp_subtitles]:
         if os.path.exists(temp_file):
             os.remove(temp_file)
-    if os.path.exists("temp_video.mp4"):
-        os.remove("temp_video.mp4")
-    if os.path.exists("temp_audio.mp3"):
-        os.remove("temp_audio.mp3")
-    if os.path.exists("temp_concat_list.txt"):
-        os.remove("temp_concat_list.txt")
     
-    print(f"Output saved to {output_video}")
+    print(f"Output saved to {', '.join(outputs.values())}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    with tracing.span("stage.edit"):
+        main()
+    render_pool.shutdown_pool()
+    whisper_pool.shutdown_pool()
\ No newline at end of file
@@ -1,14 +1,34 @@
 import cv2
 import numpy as np
+from functools import lru_cache
 
-# Paths
+import scratch
+
+# Paths; the story title and the standalone output live in the job's scratch
+# directory (ZOMBIE_JOB_ID), where ai.py writes the story
 input_image_path = "content/post.png"
-output_image_path = "content/title.png"
-text_file_path = "txt/story_title.txt"
+output_image_name = "title.png"
+text_file_name = "story_title.txt"
+
+# Define font properties
+font = cv2.FONT_HERSHEY_DUPLEX
+font_scale = 3
+font_color = (255,255,255,255)  # White with full alpha
+font_thickness = 2
+# Extra stroke width that replaces the old 13-offset bold loop (offsets of +-2px)
+bold_stroke = 4
+line_padding = 24
+
+# Adjust starting offsets for text positioning
+x_offset = -30  # Horizontal adjustment
+y_offset = 220  # Vertical adjustment
 
-# Load the text from the file
-with open(text_file_path, "r") as file:
-    text = file.read().strip()
+# Wrap the text to fit within 50 characters per line
+max_characters_per_line = 50
+
+def read_title_text(path=None):
+    with open(path or scratch.path(text_file_name), "r") as file:
+        return file.read().strip()
 
 # Word wrap function
 def wrap_text(text, max_length):
@@ -30,58 +50,70 @@ def wrap_text(text, max_length):
 
     return lines
 
-# Wrap the text to fit within 50 characters per line
-max_characters_per_line = 50
-text_lines = wrap_text(text, max_characters_per_line)
-
-# Read the image with transparency preserved
-image = cv2.imread(input_image_path, cv2.IMREAD_UNCHANGED)
-
-# Define font properties
-font = cv2.FONT_HERSHEY_DUPLEX
-font_scale = 3
-font_color = (255,255,255,255)  # Black with full alpha
-
-# Get image dimensions
-height, width = image.shape[:2]
-
-# Adjust starting offsets for text positioning
-x_offset = -30  # Horizontal adjustment
-y_offset = 220  # Vertical adjustment
-
-# Calculate total text block height and maximum line width
-line_heights = [cv2.getTextSize(line, font, font_scale, 2)[0][1] for line in text_lines]
-line_widths = [cv2.getTextSize(line, font, font_scale, 2)[0][0] for line in text_lines]
-text_height = sum(line_heights) + (len(text_lines) - 1) * 24  # Add padding between lines
-max_line_width = max(line_widths)
-
-# Calculate starting position to center the text with offsets
-x = (width - max_line_width) // 2 + x_offset
-y = (height - text_height) // 2 + line_heights[0] + y_offset
-
-# Ensure image has an alpha channel
-if len(image.shape) < 3 or image.shape[2] < 4:
-    image = cv2.cvtColor(image, cv2.COLOR_BGR2BGRA)
-
- # Function to draw even bolder text
+@lru_cache(maxsize=1)
+def load_template(path=input_image_path):
+    """Decodes the title template once and keeps it in memory (BGRA, read-only)."""
+    image = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+    if image is None:
+        raise FileNotFoundError(f"Error: Could not load title template from {path}")
+    # Ensure image has an alpha channel
+    if len(image.shape) < 3:
+        image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGRA)
+    elif image.shape[2] < 4:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2BGRA)
+    image.setflags(write=False)
+    return image
+
+# Draw bold text in a single pass by widening the stroke instead of re-drawing at offsets
 def draw_bold_text(image, text, position, font, scale, color, thickness):
-    x, y = position
-    offsets = [
-        (-2, -2), (-2, 0), (-2, 2), 
-        (0, -2), (0, 2), 
-        (2, -2), (2, 0), (2, 2), 
-        (-1, -1), (-1, 1), (1, -1), (1, 1), 
-        (0, 0)  # Center
-    ]  # Added more offsets for increased bold effect
-    for dx, dy in offsets:
-        cv2.putText(image, text, (x + dx, y + dy), font, scale, color, thickness, cv2.LINE_AA)
-
-# Put wrapped text on the image
-for i, line in enumerate(text_lines):
-    line_height = line_heights[i]
-    draw_bold_text(image, line, (x, y + i * (line_height + 24)), 
-                   font, font_scale, font_color, 2)
-
-# Save the image with transparency
-cv2.imwrite(output_image_path, image)
-print(f"Saved the updated image to {output_image_path}")
+    cv2.putText(image, text, position, font, scale, color, thickness + bold_stroke, cv2.LINE_AA)
+
+def draw_title(image, text):
+    """Draws the wrapped title onto a BGRA image in place."""
+    text_lines = wrap_text(text, max_characters_per_line)
+    if not text_lines:
+        return image
+
+    height, width = image.shape[:2]
+
+    # Calculate total text block height and maximum line width
+    sizes = [cv2.getTextSize(line, font, font_scale, font_thickness)[0] for line in text_lines]
+    line_widths = [size[0] for size in sizes]
+    line_heights = [size[1] for size in sizes]
+    text_height = sum(line_heights) + (len(text_lines) - 1) * line_padding  # Add padding between lines
+    max_line_width = max(line_widths)
+
+    # Calculate starting position to center the text with offsets
+    x = (width - max_line_width) // 2 + x_offset
+    y = (height - text_height) // 2 + line_heights[0] + y_offset
+
+    # Put wrapped text on the image
+    for i, line in enumerate(text_lines):
+        line_height = line_heights[i]
+        draw_bold_text(image, line, (x, y + i * (line_height + line_padding)),
+                       font, font_scale, font_color, font_thickness)
+    return image
+
+@lru_cache(maxsize=16)
+def render_title_card(text, size=None):
+    """
+    Returns the title card for `text` as a BGRA ndarray, optionally resized to a
+    square of `size` pixels. Results are cached by (text, size) and marked
+    read-only so they can be shared with the compositor without copying.
+    """
+    image = draw_title(load_template().copy(), text)
+    if size is not None:
+        image = cv2.resize(image, (size, size), interpolation=cv2.INTER_AREA)
+    image.setflags(write=False)
+    return image
+
+def main():
+    text = read_title_text()
+    image = render_title_card(text)
+    # Save the image with transparency
+    output_image_path = scratch.path(output_image_name)
+    cv2.imwrite(output_image_path, image)
+    print(f"Saved the updated image to {output_image_path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import hashlib
+import json
+import os
+
+# Final encode settings used by edit.py; they are part of the result cache key
+# yuv420p: raw bgr24 input (pipelined mode) would otherwise encode as 4:4:4,
+# which players and the ladder's high/main/baseline profiles don't support
+FINAL_VIDEO_ARGS = ["-c:v", "libx264", "-preset", "ultrafast", "-tune", "zerolatency", "-pix_fmt", "yuv420p"]
+FINAL_AUDIO_ARGS = ["-c:a", "aac", "-strict", "experimental"]
+# moov atom up front so playback can start before the download finishes
+FINAL_CONTAINER_ARGS = ["-movflags", "+faststart"]
+
+# Renditions the final encode can add next to the source-size video. All of
+# them come from the one composited stream through an ffmpeg split/scale graph,
+# so each extra one costs only its own encode. Sizes name the short side, so
+# "720p" is 720x1280 for a portrait video and 1280x720 for a landscape one.
+SOURCE_RENDITION = "source"
+RENDITION_LADDER = {
+    SOURCE_RENDITION: {"short_side": None, "video_bitrate": None, "profile": None},
+    "1080p": {"short_side": 1080, "video_bitrate": "6M", "profile": "high"},
+    "720p": {"short_side": 720, "video_bitrate": "3M", "profile": "main"},
+    "480p": {"short_side": 480, "video_bitrate": "1200k", "profile": "baseline"},
+}
+def _configured_renditions():
+    renditions = [SOURCE_RENDITION]
+    for name in os.environ.get("ZOMBIE_RENDITIONS", "").split(","):
+        name = name.strip()
+        if not name or name in renditions:
+            continue
+        if name not in RENDITION_LADDER:
+            print(f"Warning: unknown rendition '{name}' ignored; choose from {', '.join(RENDITION_LADDER)}")
+            continue
+        renditions.append(name)
+    return renditions
+
+# Comma-separated extra renditions, e.g. "720p,480p"; the source rendition is always produced
+RENDITIONS = _configured_renditions()
+
+def rendition_video_args(name):
+    """Video encoder arguments for one rendition: the final settings plus its rate and profile caps."""
+    settings = RENDITION_LADDER[name]
+    args = list(FINAL_VIDEO_ARGS)
+    if settings["video_bitrate"]:
+        bitrate = settings["video_bitrate"]
+        args += ["-b:v", bitrate, "-maxrate", bitrate, "-bufsize", bitrate]
+    if settings["profile"]:
+        args += ["-profile:v", settings["profile"]]
+    return args
+
+def _even(value):
+    # libx264 needs even dimensions
+    return max(2, int(round(value / 2)) * 2)
+
+def plan_renditions(renditions, width, height):
+    """
+    Output size of each rendition for a width x height source, as
+    ({rendition: (width, height) or None for the source size}, [skipped]).
+    Renditions whose short side isn't below the source's are skipped rather
+    than upscaled.
+    """
+    source_short = min(width, height)
+    sizes, skipped = {}, []
+    for name in renditions:
+        short_side = RENDITION_LADDER[name]["short_side"]
+        if not short_side:
+            sizes[name] = None
+        elif short_side >= source_short:
+            skipped.append(name)
+        else:
+            scale = short_side / source_short
+            sizes[name] = (_even(width * scale), _even(height * scale))
+    return sizes, skipped
+
+def rendition_filter_graph(sizes, source_filter=None):
+    """
+    filter_complex for the final encode: [0:v] goes through `source_filter`
+    (e.g. burned-in subtitles) once, is split per rendition and scaled to its
+    size from plan_renditions(). Returns the graph and the output label of
+    each rendition.
+    """
+    renditions = list(sizes)
+    chains = []
+    source = "[0:v]"
+    if source_filter:
+        chains.append(f"{source}{source_filter}[composited]")
+        source = "[composited]"
+    if len(renditions) > 1:
+        chains.append(f"{source}split={len(renditions)}" + "".join(f"[split{i}]" for i in range(len(renditions))))
+        inputs = [f"[split{i}]" for i in range(len(renditions))]
+    else:
+        inputs = [source]
+
+    labels = []
+    for i, name in enumerate(renditions):
+        size = sizes[name]
+        chains.append(f"{inputs[i]}{f'scale={size[0]}:{size[1]}' if size else 'null'}[out{i}]")
+        labels.append(f"[out{i}]")
+    return ";".join(chains), labels
+
+# Subtitle engine: "python" composites words frame by frame in edit.py,
+# "ass" compiles them to an ASS script that libass burns in during the final encode
+SUBTITLE_ENGINE = os.environ.get("ZOMBIE_SUBTITLE_ENGINE", "python")
+
+# Whisper model and backend (see whisper_backend) set the word timings, so
+# they change the rendered video too. Read here so the cache key doesn't need torch.
+WHISPER_MODEL = os.environ.get("ZOMBIE_WHISPER_MODEL", "base")
+WHISPER_BACKEND = os.environ.get("ZOMBIE_WHISPER_BACKEND", "fp32")
+
+def profile_id():
+    """Short, stable id of the current encoding settings."""
+    settings = {"video": FINAL_VIDEO_ARGS, "audio": FINAL_AUDIO_ARGS, "container": FINAL_CONTAINER_ARGS,
+                "subtitles": SUBTITLE_ENGINE,
+                "whisper": {"model": WHISPER_MODEL, "backend": WHISPER_BACKEND},
+                "renditions": {name: RENDITION_LADDER[name] for name in RENDITIONS}}
+    return hashlib.sha1(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()[:12]
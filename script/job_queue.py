@@ -0,0 +1,242 @@
+import json
+import os
+import sqlite3
+import time
+from contextlib import closing
+
+# Where the API enqueues jobs and workers claim them; empty = run jobs in the API process.
+#   sqlite:///queue/jobs.db    single host, any number of worker processes
+#   redis://host:6379/0        multi-host (needs the redis package)
+QUEUE_URL = os.environ.get("ZOMBIE_QUEUE_URL", "")
+# A claimed job is reclaimed by another worker if its lease isn't renewed in time
+LEASE_SECONDS = int(os.environ.get("ZOMBIE_LEASE_SECONDS", "120"))
+# Claims per job before it is marked failed instead of being handed out again
+MAX_ATTEMPTS = int(os.environ.get("ZOMBIE_MAX_ATTEMPTS", "3"))
+
+# Enqueued jobs waiting for a worker before the API answers 429
+MAX_PENDING = int(os.environ.get("ZOMBIE_MAX_PENDING", "100"))
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+def _text(value):
+    # redis-py returns bytes unless the client was created with decode_responses
+    return value.decode() if isinstance(value, bytes) else value
+
+class SQLiteQueue:
+    """
+    Job queue in a SQLite file. Claims run in an IMMEDIATE transaction, so
+    workers on the same host (or sharing the file over a local filesystem)
+    never hand out the same job twice.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with closing(self._connect()) as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY, payload TEXT NOT NULL, state TEXT NOT NULL,"
+                " attempts INTEGER NOT NULL DEFAULT 0, worker TEXT, lease_expires REAL,"
+                " enqueued_at REAL NOT NULL, started_at REAL, finished_at REAL, error TEXT)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, enqueued_at)")
+
+    def _connect(self):
+        # One connection per call keeps the queue usable from Flask's threads
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        return db
+
+    def enqueue(self, job, payload):
+        with closing(self._connect()) as db:
+            db.execute("INSERT INTO jobs (id, payload, state, enqueued_at) VALUES (?, ?, ?, ?)",
+                       (job, json.dumps(payload), QUEUED, time.time()))
+
+    def claim(self, worker, lease_seconds=LEASE_SECONDS):
+        """Hands the oldest queued or abandoned job to `worker`, or returns None."""
+        now = time.time()
+        with closing(self._connect()) as db:
+            db.execute("BEGIN IMMEDIATE")
+            # Jobs whose worker stopped heartbeating and that have no attempts left
+            db.execute("UPDATE jobs SET state = ?, finished_at = ?, error = 'lease expired' "
+                       "WHERE state = ? AND lease_expires < ? AND attempts >= ?",
+                       (FAILED, now, RUNNING, now, MAX_ATTEMPTS))
+            row = db.execute("SELECT * FROM jobs WHERE state = ? OR (state = ? AND lease_expires < ?) "
+                             "ORDER BY enqueued_at LIMIT 1", (QUEUED, RUNNING, now)).fetchone()
+            if row is None:
+                db.execute("COMMIT")
+                return None
+            db.execute("UPDATE jobs SET state = ?, worker = ?, lease_expires = ?, attempts = attempts + 1, "
+                       "started_at = ? WHERE id = ?", (RUNNING, worker, now + lease_seconds, now, row["id"]))
+            db.execute("COMMIT")
+        return {"id": row["id"], "payload": json.loads(row["payload"]), "attempt": row["attempts"] + 1}
+
+    def heartbeat(self, job, worker, lease_seconds=LEASE_SECONDS):
+        """Extends the lease; False means the job was reclaimed and the worker should stop."""
+        with closing(self._connect()) as db:
+            cursor = db.execute("UPDATE jobs SET lease_expires = ? WHERE id = ? AND worker = ? AND state = ?",
+                                (time.time() + lease_seconds, job, worker, RUNNING))
+            return cursor.rowcount == 1
+
+    def complete(self, job, worker, state=DONE, error=None):
+        """Records the result; ignored if another worker holds the job by now."""
+        with closing(self._connect()) as db:
+            cursor = db.execute("UPDATE jobs SET state = ?, finished_at = ?, error = ?, lease_expires = NULL "
+                                "WHERE id = ? AND worker = ? AND state = ?",
+                                (state, time.time(), error, job, worker, RUNNING))
+            return cursor.rowcount == 1
+
+    def pending_count(self):
+        with closing(self._connect()) as db:
+            return db.execute("SELECT COUNT(*) FROM jobs WHERE state = ?", (QUEUED,)).fetchone()[0]
+
+    def get(self, job):
+        with closing(self._connect()) as db:
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (job,)).fetchone()
+            if row is None:
+                return None
+            status = {key: row[key] for key in ("id", "state", "attempts", "worker", "enqueued_at",
+                                                "started_at", "finished_at", "error")}
+            status["payload"] = json.loads(row["payload"])
+            if row["state"] == QUEUED:
+                status["position"] = db.execute("SELECT COUNT(*) FROM jobs WHERE state = ? AND enqueued_at < ?",
+                                                (QUEUED, row["enqueued_at"])).fetchone()[0]
+            return status
+
+class RedisQueue:
+    """
+    The same queue on a Redis server (redis-py client or anything exposing its
+    API, such as fakeredis). Jobs are hashes, the backlog is a list and leases
+    are a sorted set scored by expiry time. Every state change is one
+    WATCH/MULTI/EXEC transaction, so a worker dying halfway through can't
+    leave a job neither pending nor leased.
+    """
+
+    def __init__(self, client, prefix="zombie:queue"):
+        self.redis = client
+        self.prefix = prefix
+
+    def _key(self, *parts):
+        return ":".join((self.prefix,) + parts)
+
+    def enqueue(self, job, payload):
+        with self.redis.pipeline() as pipe:
+            pipe.hset(self._key("job", job), mapping={
+                "id": job, "payload": json.dumps(payload), "state": QUEUED, "attempts": 0,
+                "enqueued_at": time.time(),
+            })
+            pipe.lpush(self._key("pending"), job)
+            pipe.execute()
+
+    def _transaction(self, func, *keys):
+        # Runs func(pipe) under WATCH on `keys`, retrying if another client changed them
+        return self.redis.transaction(func, *keys, value_from_callable=True)
+
+    def _reclaim(self, now):
+        leases = self._key("leases")
+        for job in self.redis.zrangebyscore(leases, 0, now):
+            job = _text(job)
+            key = self._key("job", job)
+
+            def requeue(pipe):
+                # The lease may have been renewed or reclaimed since it was listed
+                expires = pipe.zscore(leases, job)
+                if expires is None or expires > now:
+                    return
+                attempts = int(pipe.hget(key, "attempts") or 0)
+                pipe.multi()
+                pipe.zrem(leases, job)
+                if attempts >= MAX_ATTEMPTS:
+                    pipe.hset(key, mapping={"state": FAILED, "finished_at": now, "error": "lease expired"})
+                else:
+                    pipe.hset(key, "state", QUEUED)
+                    # Back to the front: it has waited longest
+                    pipe.rpush(self._key("pending"), job)
+
+            self._transaction(requeue, leases, key)
+
+    def claim(self, worker, lease_seconds=LEASE_SECONDS):
+        now = time.time()
+        self._reclaim(now)
+        pending = self._key("pending")
+
+        def take(pipe):
+            job = pipe.lindex(pending, -1)
+            if job is None:
+                return None
+            job = _text(job)
+            key = self._key("job", job)
+            attempts = int(pipe.hget(key, "attempts") or 0) + 1
+            payload = pipe.hget(key, "payload")
+            # Popping the job and leasing it happen together or not at all
+            pipe.multi()
+            pipe.rpop(pending)
+            pipe.zadd(self._key("leases"), {job: now + lease_seconds})
+            pipe.hset(key, mapping={"state": RUNNING, "worker": worker, "started_at": now,
+                                    "attempts": attempts})
+            return {"id": job, "payload": json.loads(payload), "attempt": attempts}
+
+        return self._transaction(take, pending)
+
+    def _owned(self, pipe, job, worker):
+        owner, state = (_text(value) for value in pipe.hmget(self._key("job", job), "worker", "state"))
+        return owner == worker and state == RUNNING
+
+    def heartbeat(self, job, worker, lease_seconds=LEASE_SECONDS):
+        leases = self._key("leases")
+
+        def renew(pipe):
+            # Never resurrect a lease that was already reclaimed
+            if not self._owned(pipe, job, worker) or pipe.zscore(leases, job) is None:
+                return False
+            pipe.multi()
+            pipe.zadd(leases, {job: time.time() + lease_seconds})
+            return True
+
+        return self._transaction(renew, leases, self._key("job", job))
+
+    def complete(self, job, worker, state=DONE, error=None):
+        key = self._key("job", job)
+
+        def finish(pipe):
+            if not self._owned(pipe, job, worker):
+                return False
+            pipe.multi()
+            pipe.zrem(self._key("leases"), job)
+            pipe.hset(key, mapping={"state": state, "finished_at": time.time(), "error": error or ""})
+            return True
+
+        return self._transaction(finish, key)
+
+    def pending_count(self):
+        return self.redis.llen(self._key("pending"))
+
+    def get(self, job):
+        raw = self.redis.hgetall(self._key("job", job))
+        if not raw:
+            return None
+        raw = {_text(key): _text(value) for key, value in raw.items()}
+        status = {
+            "id": raw["id"], "state": raw["state"], "attempts": int(raw.get("attempts", 0)),
+            "worker": raw.get("worker"), "enqueued_at": float(raw["enqueued_at"]),
+            "started_at": float(raw["started_at"]) if raw.get("started_at") else None,
+            "finished_at": float(raw["finished_at"]) if raw.get("finished_at") else None,
+            "error": raw.get("error") or None, "payload": json.loads(raw["payload"]),
+        }
+        if status["state"] == QUEUED:
+            pending = [_text(item) for item in self.redis.lrange(self._key("pending"), 0, -1)]
+            # Workers pop from the right, so everything to the right is ahead
+            if job in pending:
+                status["position"] = len(pending) - 1 - pending.index(job)
+        return status
+
+def open_queue(url=None):
+    url = url or QUEUE_URL
+    if url.startswith("sqlite:///"):
+        return SQLiteQueue(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        import redis  # Only needed for multi-host deployments
+        return RedisQueue(redis.Redis.from_url(url))
+    raise ValueError(f"Unsupported queue URL: {url!r}")
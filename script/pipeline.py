@@ -0,0 +1,143 @@
+import os
+import subprocess
+import time
+import uuid
+import atexit
+
+import tracing
+import render_cache
+import render_pool
+import scratch
+import artifacts
+import encoding
+import whisper_pool
+
+# Runs one job's stages; shared by the API (run.py) and queue workers (worker.py).
+# Both processes outlive jobs, so their spans report RSS at span end rather than their lifetime peak
+tracing.long_lived_process()
+
+# The edit stage runs inside the calling process so its render pool and worker
+# caches survive across jobs; Whisper runs in its own worker process (whisper_pool)
+atexit.register(render_pool.shutdown_pool)
+atexit.register(whisper_pool.shutdown_pool)
+
+# Number of scripts
+total_scripts = 11
+# How often a running stage script checks whether its job was cancelled
+CANCEL_POLL_SECONDS = 1.0
+
+class JobCancelled(Exception):
+    pass
+
+def run_edit_stage(job_id, seed, cancel=None):
+    import edit  # Heavy (cv2, PIL); only loaded once the first job reaches this stage
+
+    with tracing.span("stage.edit", job=job_id):
+        edit.main(job_id, seed, cancel)
+
+def run_stage_script(script, env, cancel=None):
+    """Runs one stage script, terminating it if `cancel` is set meanwhile."""
+    # Waited for through tracing so the script's CPU time lands on this job's spans
+    process = subprocess.Popen(["python", script], env=env)
+    while True:
+        returncode = tracing.wait_child(process, None if cancel is None else CANCEL_POLL_SECONDS)
+        if returncode is not None:
+            break
+        if cancel.is_set():
+            process.terminate()
+            tracing.wait_child(process)
+            raise JobCancelled(f"{script} stopped: job cancelled")
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, ["python", script])
+
+def save_topic_to_file(topic, job_id):
+    try:
+        # Every file the stages hand to each other lives in the job's scratch
+        # directory, so concurrent jobs never see each other's topic or story
+        with open(scratch.path("topic.txt", job_id), "w", encoding='utf-8') as file:
+            file.write(f"{topic}\n")
+    except Exception as e:
+        print(f"Error saving topic to file: {e}")
+
+def run_scripts(topic, completion_event, job_id=None, seed=None, cancel=None):
+    """
+    Runs every stage of a job and returns "ok", "error" or "cancelled". Setting
+    `cancel` (a threading.Event) stops the job between or during stages and
+    keeps it from publishing anything.
+    """
+    job_id = job_id or uuid.uuid4().hex
+    # Every stage writes its spans to the same per-job trace file and draws
+    # its random choices from the job seed
+    env = dict(os.environ, ZOMBIE_JOB_ID=job_id)
+    if seed is not None:
+        env["ZOMBIE_SEED"] = str(seed)
+    # Queue attempts keep separate scratch directories (see scratch.attempt_scope)
+    if scratch.attempt():
+        env["ZOMBIE_ATTEMPT"] = scratch.attempt()
+    status = "ok"
+    cache_key = None
+    try:
+        start_time = time.time()
+        save_topic_to_file(topic, job_id)
+
+        scripts = [
+            "script/cleanup.py", "script/ai.py",
+            "script/audio.py", "script/video.py", "script/edit.py"
+        ]
+
+        with tracing.span("job", job=job_id, topic=topic, seed=seed) as job_span:
+            for index, script in enumerate(scripts, 1):
+                if cancel is not None and cancel.is_set():
+                    status = "cancelled"
+                    break
+                try:
+                    if script == "script/edit.py":
+                        run_edit_stage(job_id, seed, cancel)
+                    else:
+                        run_stage_script(script, env, cancel)
+                except Exception as e:
+                    print(f"Error running script {script}: {e}")
+                    status = "error"
+                update_progress(index)
+
+                # Once the story is known, a previous render of it can be reused
+                if script == "script/ai.py" and status == "ok":
+                    cache_key = render_cache.cache_key(seed, job_id)
+                    cached = render_cache.lookup(cache_key)
+                    if cached:
+                        with tracing.span("cache.hit", job=job_id, renditions=len(cached)):
+                            # Source last, as in edit.py: once it exists, the whole ladder and manifest do
+                            skipped = [rendition for rendition in encoding.RENDITIONS if rendition not in cached]
+                            artifacts.write_manifest(job_id, cached, skipped)
+                            for rendition in sorted(cached, key=lambda name: name == encoding.SOURCE_RENDITION):
+                                path = cached[rendition]
+                                artifacts.store_copy(path, job_id, artifacts.rendition_name(rendition))
+                        print(f"Reusing cached render {cached[encoding.SOURCE_RENDITION]}")
+                        cache_key = None
+                        break
+            if cancel is not None and cancel.is_set():
+                status = "cancelled"
+            # A failed stage doesn't raise, so the span's own status can't tell
+            job_span["outcome"] = status
+
+        manifest = artifacts.read_manifest(job_id)
+        if status == "ok" and cache_key and manifest:
+            render_cache.store(cache_key, {rendition: artifacts.rendition_path(job_id, rendition)
+                                           for rendition in manifest["renditions"]})
+
+        elapsed_time = int(time.time() - start_time)
+        show_results(topic, elapsed_time)
+
+    finally:
+        scratch.release(job_id)
+        # Notify that the task is completed
+        completion_event.set()
+    return status
+
+def update_progress(step):
+    # Update progress in the log (optional)
+    print(f"Progress: Step {step}/{total_scripts}")
+
+def show_results(topic, elapsed_time):
+    # Show final result in the log (optional)
+    print(f"Video on '{topic}' generated in {elapsed_time}s!")
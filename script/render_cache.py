@@ -0,0 +1,187 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import encoding
+import scratch
+
+CACHE_DIR = os.environ.get("ZOMBIE_CACHE_DIR", "cache/renders")
+# LLM responses of seeded story requests
+STORY_CACHE_DIR = os.environ.get("ZOMBIE_STORY_CACHE_DIR", "cache/stories")
+# Every job is seeded, so both caches see every job; past these sizes the least
+# recently used entries are evicted. 0 = unlimited
+CACHE_MAX_BYTES = int(os.environ.get("ZOMBIE_CACHE_MAX_MB", "10240")) * 2**20
+STORY_CACHE_MAX_BYTES = int(os.environ.get("ZOMBIE_STORY_CACHE_MAX_MB", "64")) * 2**20
+
+# Files in the job's scratch directory that make up a story once the LLM stage has run
+STORY_FILES = ["story_title.txt", "story_body.txt", "sex.txt", "sex2.txt"]
+# Static assets that change the rendered output; small ones are hashed by content,
+# large ones by size and modification time
+ASSET_FILES = ["content/font.ttf", "content/post.png", "content/bg.mp3"]
+LARGE_ASSET_FILES = ["content/bg.mp4"]
+
+def _hash_file(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def story_hash(job=None):
+    """Hash of the job's generated story, or None if the LLM stage produced nothing."""
+    digest = hashlib.sha256()
+    for name in STORY_FILES:
+        path = scratch.path(name, job)
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            digest.update(f.read().strip())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+def asset_versions():
+    versions = {}
+    for path in ASSET_FILES:
+        versions[path] = _hash_file(path) if os.path.exists(path) else None
+    for path in LARGE_ASSET_FILES:
+        if os.path.exists(path):
+            stat = os.stat(path)
+            versions[path] = f"{stat.st_size}:{int(stat.st_mtime)}"
+        else:
+            versions[path] = None
+    return versions
+
+def cache_key(seed, job=None):
+    """Key for (story hash, seed, encoding profile, asset versions), or None without a story."""
+    story = story_hash(job)
+    if story is None:
+        return None
+    key = {
+        "story": story,
+        "seed": seed,
+        "profile": encoding.profile_id(),
+        "assets": asset_versions(),
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode("utf-8")).hexdigest()
+
+def cache_path(key, rendition=encoding.SOURCE_RENDITION):
+    if rendition == encoding.SOURCE_RENDITION:
+        return os.path.join(CACHE_DIR, f"{key}.mp4")
+    return os.path.join(CACHE_DIR, f"{key}-{rendition}.mp4")
+
+def lookup(key):
+    """
+    Returns {rendition: path} of the cached render for `key`, or None. Stores
+    finish with the source, so once it is cached so are the renditions the
+    render produced; the rest were skipped for the source's size.
+    """
+    if key is None or not os.path.exists(cache_path(key)):
+        return None
+    _touch(cache_path(key))
+    paths = {rendition: cache_path(key, rendition) for rendition in encoding.RENDITIONS}
+    return {rendition: path for rendition, path in paths.items() if os.path.exists(path)}
+
+def _touch(path):
+    # Modification time doubles as last use for eviction
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
+
+def _entries(directory):
+    """{key: [last used, bytes, paths]} of a cache directory; a key's renditions form one entry."""
+    entries = {}
+    for name in os.listdir(directory):
+        if name.endswith(".tmp"):
+            continue  # Still being written
+        path = os.path.join(directory, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entry = entries.setdefault(name.split(".")[0].split("-")[0], [0, 0, []])
+        entry[0] = max(entry[0], stat.st_mtime)
+        entry[1] += stat.st_size
+        entry[2].append(path)
+    return entries
+
+def evict(directory, max_bytes):
+    """Deletes least recently used entries until `directory` fits in `max_bytes`; returns how many."""
+    if max_bytes <= 0 or not os.path.isdir(directory):
+        return 0
+    entries = _entries(directory)
+    total = sum(size for _, size, _ in entries.values())
+    removed = 0
+    for used, size, paths in sorted(entries.values(), key=lambda entry: entry[0]):
+        if total <= max_bytes:
+            break
+        # The source (shortest name) goes first, so lookups stop matching before its renditions go
+        for path in sorted(paths, key=len):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        total -= size
+        removed += 1
+    return removed
+
+def _temp_path(directory):
+    # Unique per call: jobs in one process may store the same key at once
+    fd, path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    os.close(fd)
+    return path
+
+def store(key, video_paths):
+    """
+    Copies a finished render's renditions ({rendition: path}) into the cache.
+    The source rendition goes last, so lookups never see an incomplete set;
+    renames keep readers from seeing partial files.
+    """
+    if key is None or not all(os.path.exists(path) for path in video_paths.values()):
+        return None
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    stored = {}
+    for rendition in sorted(video_paths, key=lambda name: name == encoding.SOURCE_RENDITION):
+        path = cache_path(key, rendition)
+        temp_path = _temp_path(CACHE_DIR)
+        shutil.copyfile(video_paths[rendition], temp_path)
+        os.replace(temp_path, path)
+        stored[rendition] = path
+    evict(CACHE_DIR, CACHE_MAX_BYTES)
+    return stored
+
+def story_key(payload):
+    """
+    Key for an LLM story request (topic, seed, model, prompt and sampling
+    settings), or None for unseeded requests, whose stories aren't meant to repeat.
+    """
+    if payload.get("seed") is None:
+        return None
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+def lookup_story(key):
+    """Returns the cached LLM response for `key`, or None."""
+    if key is None:
+        return None
+    path = os.path.join(STORY_CACHE_DIR, f"{key}.json")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            content = f.read()
+    except OSError:
+        return None
+    _touch(path)
+    return content
+
+def store_story(key, content):
+    if key is None:
+        return None
+    os.makedirs(STORY_CACHE_DIR, exist_ok=True)
+    path = os.path.join(STORY_CACHE_DIR, f"{key}.json")
+    temp_path = _temp_path(STORY_CACHE_DIR)
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(temp_path, path)
+    evict(STORY_CACHE_DIR, STORY_CACHE_MAX_BYTES)
+    return path
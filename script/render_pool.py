@@ -0,0 +1,145 @@
+import multiprocessing
+import os
+import pickle
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import tracing
+
+# Render workers; 0 = one per CPU
+RENDER_WORKERS = int(os.environ.get("ZOMBIE_RENDER_WORKERS", "0"))
+# Jobs whose assets a worker keeps attached before closing the oldest
+ATTACHED_JOBS = 2
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def pool_size():
+    return RENDER_WORKERS or os.cpu_count()
+
+def get_pool():
+    """
+    Returns the process-wide render pool, creating it on first use. The pool
+    outlives individual jobs, so worker startup and per-process caches (fonts,
+    text sizes) are paid once per server rather than once per render.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawned workers don't inherit the server's threads or the Whisper model
+            _pool = ProcessPoolExecutor(max_workers=pool_size(), mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+def discard_pool(pool):
+    """Drops a pool whose worker died, so the next get_pool() starts a fresh one."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+            _pool = None
+
+class JobAssets:
+    """
+    Per-job render inputs published once into shared memory. Workers receive
+    only `handle` (segment names, shapes and dtypes) and attach by name.
+    """
+
+    def __init__(self, job, arrays=None, objects=None):
+        self._segments = []
+        self.arrays = {}
+        # "key" tells workers apart from earlier publications for the same job
+        self.handle = {"job": job, "key": uuid.uuid4().hex, "arrays": {}, "objects": None}
+        for name, array in (arrays or {}).items():
+            array = np.ascontiguousarray(array)
+            self.allocate(name, array.shape, array.dtype)[...] = array
+        if objects:
+            # Small Python values (word list, sizes) are pickled once into a segment too
+            payload = pickle.dumps(objects, protocol=pickle.HIGHEST_PROTOCOL)
+            shm = self._allocate(len(payload))
+            shm.buf[:len(payload)] = payload
+            self.handle["objects"] = (shm.name, len(payload))
+
+    def _allocate(self, size):
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        self._segments.append(shm)
+        return shm
+
+    def allocate(self, name, shape, dtype=np.uint8):
+        """Adds an uninitialized shared array; call before the handle is sent to workers."""
+        dtype = np.dtype(dtype)
+        shm = self._allocate(max(1, int(np.prod(shape)) * dtype.itemsize))
+        view = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        self.arrays[name] = view
+        self.handle["arrays"][name] = (shm.name, tuple(shape), dtype.str)
+        return view
+
+    def release(self):
+        self.arrays = {}
+        for shm in self._segments:
+            try:
+                shm.close()
+            except BufferError:
+                pass  # A caller still holds a view; the mapping goes when it does
+            try:
+                shm.unlink()
+            except FileNotFoundError:
+                pass
+        self._segments = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+# ---------------- Worker side ----------------
+# handle key -> {"segments": [...], "arrays": {...}, "objects": {...}}
+_attached = OrderedDict()
+
+def _detach(key):
+    entry = _attached.pop(key)
+    entry["arrays"].clear()
+    for shm in entry["segments"]:
+        try:
+            shm.close()
+        except BufferError:
+            pass
+
+def attach(handle):
+    """Maps a job's published assets into this worker, once per publication."""
+    key = handle["key"]
+    # Spans recorded by the worker belong to the job being rendered; the
+    # worker itself outlives jobs, so it reports per-span RSS, not its peak
+    os.environ["ZOMBIE_JOB_ID"] = handle["job"]
+    tracing.long_lived_process()
+    if key in _attached:
+        _attached.move_to_end(key)
+        return _attached[key]
+
+    entry = {"segments": [], "arrays": {}, "objects": {}}
+    for name, (shm_name, shape, dtype) in handle["arrays"].items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        entry["segments"].append(shm)
+        entry["arrays"][name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+    if handle["objects"]:
+        shm_name, size = handle["objects"]
+        shm = shared_memory.SharedMemory(name=shm_name)
+        entry["objects"] = pickle.loads(bytes(shm.buf[:size]))
+        shm.close()
+
+    _attached[key] = entry
+    while len(_attached) > ATTACHED_JOBS:
+        _detach(next(iter(_attached)))
+    return entry
@@ -0,0 +1,169 @@
+import contextvars
+import json
+import os
+import shutil
+import time
+from contextlib import contextmanager
+
+import tracing
+
+# Per-job scratch directories for intermediates. RAM (tmpfs) is preferred when
+# the job's estimated footprint fits; otherwise the job goes to disk.
+RAM_ROOT = os.environ.get("ZOMBIE_SCRATCH_RAM", "/dev/shm/zombie")
+DISK_ROOT = os.environ.get("ZOMBIE_SCRATCH_DISK", "scratch")
+# Only use tmpfs if the estimate fits in this fraction of its free space
+RAM_FILL_LIMIT = 0.5
+# Used when a stage asks for scratch space without an estimate
+DEFAULT_JOB_BYTES = 512 * 1024 * 1024
+# Directories not touched for this long are considered abandoned
+MAX_AGE_SECONDS = int(os.environ.get("ZOMBIE_SCRATCH_MAX_AGE", str(6 * 3600)))
+
+OWNER_FILE = ".owner"
+
+# Queue attempt of the job this process or thread works on. A reclaimed job
+# runs again under a new attempt, possibly while the old worker is still
+# finishing, so each attempt gets its own directory.
+_scoped_attempt = contextvars.ContextVar("zombie_attempt", default=None)
+
+def attempt():
+    """The enclosing attempt_scope(), else ZOMBIE_ATTEMPT; "" outside the queue."""
+    value = _scoped_attempt.get()
+    return str(value) if value is not None else os.environ.get("ZOMBIE_ATTEMPT", "")
+
+@contextmanager
+def attempt_scope(value):
+    token = _scoped_attempt.set(value)
+    try:
+        yield value
+    finally:
+        _scoped_attempt.reset(token)
+
+def _dir_name(job):
+    return f"{job}.{attempt()}" if attempt() else job
+
+def estimate_job_bytes(duration_s, width=1080, height=1920, fps=30):
+    """
+    Rough upper bound on a job's intermediates: the libx264 background clip,
+    mp4v chunks plus their concatenation, and the mp3 narration and mix.
+    """
+    pixels_per_second = width * height * fps
+    x264_clip = pixels_per_second * 0.1 / 8  # ~0.1 bits/pixel at crf 23
+    mp4v_frames = pixels_per_second * 0.3 / 8 * 2  # chunks + concatenated copy
+    audio = 320_000 / 8 * 2  # combined narration + mixed track
+    return int(duration_s * (x264_clip + mp4v_frames + audio) * 1.25)
+
+def _ram_available():
+    return bool(RAM_ROOT) and os.path.isdir(os.path.dirname(RAM_ROOT) or ".")
+
+def _roots():
+    return [RAM_ROOT, DISK_ROOT] if _ram_available() else [DISK_ROOT]
+
+def _choose_root(estimate_bytes):
+    if _ram_available():
+        free = shutil.disk_usage(os.path.dirname(RAM_ROOT) or ".").free
+        if estimate_bytes <= free * RAM_FILL_LIMIT:
+            return RAM_ROOT
+    return DISK_ROOT
+
+def _read_owner(directory):
+    try:
+        with open(os.path.join(directory, OWNER_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _touch_owner(directory, created=False, estimate_bytes=None):
+    owner = os.path.join(directory, OWNER_FILE)
+    if created:
+        # estimate_bytes stays None until a stage knows the job's real size
+        with open(owner, "w", encoding="utf-8") as f:
+            json.dump({"job": os.path.basename(directory), "created": time.time(), "pid": os.getpid(),
+                       "estimate_bytes": estimate_bytes}, f)
+    else:
+        os.utime(owner, None)
+
+def _place(job, directory, estimate_bytes):
+    # Before the first real estimate the directory only holds small hand-off files
+    target = os.path.join(_choose_root(estimate_bytes), _dir_name(job))
+    if target != directory:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.move(directory, target)
+        print(f"Moved scratch for job {job} to {target} (estimated {estimate_bytes / 2**20:.0f} MiB)")
+    _touch_owner(target, created=True, estimate_bytes=estimate_bytes)
+    return target
+
+def job_dir(job=None, estimate_bytes=None):
+    """
+    Returns the job's scratch directory, creating it on first use. Every stage
+    of a job resolves to the same directory; each call marks it as alive.
+    Until a caller passes a real estimate the directory sits wherever the
+    default estimate fits; the first estimate moves it to tmpfs or disk to
+    match, so paths resolved before that call must be resolved again.
+    """
+    job = job or tracing.job_id()
+    for root in _roots():
+        directory = os.path.join(root, _dir_name(job))
+        if os.path.isdir(directory):
+            if estimate_bytes and not _read_owner(directory).get("estimate_bytes"):
+                return _place(job, directory, estimate_bytes)
+            try:
+                _touch_owner(directory)
+            except OSError:
+                _touch_owner(directory, created=True)
+            return directory
+
+    root = _choose_root(estimate_bytes or DEFAULT_JOB_BYTES)
+    directory = os.path.join(root, _dir_name(job))
+    os.makedirs(directory, exist_ok=True)
+    _touch_owner(directory, created=True, estimate_bytes=estimate_bytes)
+    print(f"Scratch for job {job}: {directory} (estimated {(estimate_bytes or DEFAULT_JOB_BYTES) / 2**20:.0f} MiB)")
+    return directory
+
+def path(name, job=None, estimate_bytes=None):
+    """Absolute path of an intermediate file inside the job's scratch directory."""
+    return os.path.abspath(os.path.join(job_dir(job, estimate_bytes), name))
+
+def usage_bytes(job=None):
+    job = job or tracing.job_id()
+    total = 0
+    for root in _roots():
+        directory = os.path.join(root, _dir_name(job))
+        for dirpath, _, filenames in os.walk(directory):
+            for filename in filenames:
+                try:
+                    total += os.path.getsize(os.path.join(dirpath, filename))
+                except OSError:
+                    pass
+    return total
+
+def release(job=None):
+    """Deletes the job's scratch directory, recording what it held."""
+    job = job or tracing.job_id()
+    with tracing.span("scratch.release", job=job) as span:
+        span["bytes"] = usage_bytes(job)
+        for root in _roots():
+            directory = os.path.join(root, _dir_name(job))
+            if os.path.isdir(directory):
+                span["root"] = root
+                shutil.rmtree(directory, ignore_errors=True)
+
+def collect_garbage(max_age=MAX_AGE_SECONDS):
+    """Removes scratch directories of jobs that haven't touched them in `max_age` seconds."""
+    removed = []
+    now = time.time()
+    for root in _roots():
+        if not os.path.isdir(root):
+            continue
+        for name in os.listdir(root):
+            directory = os.path.join(root, name)
+            if not os.path.isdir(directory):
+                continue
+            owner = os.path.join(directory, OWNER_FILE)
+            try:
+                last_seen = os.path.getmtime(owner if os.path.exists(owner) else directory)
+            except OSError:
+                continue
+            if now - last_seen > max_age:
+                shutil.rmtree(directory, ignore_errors=True)
+                removed.append(directory)
+    return removed
@@ -0,0 +1,38 @@
+import contextvars
+import os
+import random
+from contextlib import contextmanager
+
+_UNSET = object()
+# Set by seed_scope() for stages that run inside a long-lived process
+_scoped_seed = contextvars.ContextVar("zombie_seed", default=_UNSET)
+
+def job_seed():
+    """
+    The per-job seed: the enclosing seed_scope(), else the one run.py put in
+    the environment; None for unseeded runs.
+    """
+    seed = _scoped_seed.get()
+    if seed is not _UNSET:
+        return seed
+    seed = os.environ.get("ZOMBIE_SEED")
+    return int(seed) if seed not in (None, "") else None
+
+@contextmanager
+def seed_scope(seed):
+    token = _scoped_seed.set(seed)
+    try:
+        yield seed
+    finally:
+        _scoped_seed.reset(token)
+
+def rng(stage, seed=None):
+    """
+    Returns a random.Random for one stage. With a job seed each stage gets its
+    own reproducible stream, so adding draws in one stage doesn't shift another.
+    """
+    if seed is None:
+        seed = job_seed()
+    if seed is None:
+        return random.Random()
+    return random.Random(f"{seed}:{stage}")
@@ -0,0 +1,67 @@
+import numpy as np
+
+# Subtitle pop-in and fade timing (seconds)
+SCALE_DURATION = 0.3
+FADE_DURATION = 0.15
+
+def ease_in_out_quad(t):
+    """Vectorized version of edit.ease_in_out_quad."""
+    return np.where(t < 0.5, 2 * t * t, -1 + (4 - 2 * t) * t)
+
+def _progress(numerator, denominator):
+    if denominator <= 0:
+        return np.zeros_like(numerator, dtype=np.float64)
+    return numerator / denominator
+
+def compile_timeline(word_durations, fps, total_frames, height, base_font_size, max_font_size,
+                     overlay_size, overlay_frames, zoom_in_frames, fall_out_frames):
+    """
+    Precomputes every per-frame overlay parameter for a job as flat arrays indexed
+    by frame number, so renderers do O(1) lookups from any starting frame:
+
+    word_id      index into word_durations of the active word, -1 for none
+    font_size    subtitle font size for the active word
+    alpha        subtitle opacity
+    title_size   side of the resized title card, 0 when the title is hidden
+    title_y      vertical offset of the title card
+    """
+    frames = np.arange(total_frames)
+    times = frames / fps
+
+    # Active word: the first word that has not ended yet, if it has already started
+    word_id = np.full(total_frames, -1, dtype=np.int32)
+    font_size = np.zeros(total_frames, dtype=np.int16)
+    alpha = np.zeros(total_frames, dtype=np.float32)
+    if word_durations:
+        starts = np.array([word["start"] for word in word_durations], dtype=np.float64)
+        ends = np.array([word["end"] for word in word_durations], dtype=np.float64)
+        index = np.searchsorted(ends, times, side="right")
+        clipped = np.minimum(index, len(word_durations) - 1)
+        active = (index < len(word_durations)) & (starts[clipped] <= times)
+        word_id[active] = clipped[active]
+
+        # Ease-out quad pop-in from base to max size, then fade past the word end
+        t = np.clip((times - starts[clipped]) / SCALE_DURATION, 0, 1)
+        sizes = int(base_font_size) + (int(max_font_size) - int(base_font_size)) * (1 - (1 - t) ** 2)
+        fade = np.clip((times - ends[clipped]) / FADE_DURATION, 0, 1)
+        font_size[active] = sizes[active].astype(np.int16)
+        alpha[active] = np.where(times > ends[clipped], 1 - fade, 1)[active]
+
+    # Title: zoom in over the first frames, fall out over the last ones
+    scale = np.where(frames < zoom_in_frames,
+                     0.5 + 0.5 * ease_in_out_quad(_progress(frames, zoom_in_frames)), 1.0)
+    fall_start = overlay_frames - fall_out_frames
+    falling = (frames >= zoom_in_frames) & (frames > fall_start)
+    y_offset = np.where(falling,
+                        ease_in_out_quad(_progress(frames - fall_start, fall_out_frames)) * (height * 0.5), 0)
+    visible = frames < overlay_frames
+    title_size = np.where(visible, (overlay_size * scale).astype(np.int32), 0).astype(np.int32)
+    title_y = np.where(visible, y_offset.astype(np.int32), 0).astype(np.int32)
+
+    return {
+        "word_id": word_id,
+        "font_size": font_size,
+        "alpha": alpha,
+        "title_size": title_size,
+        "title_y": title_y,
+    }
@@ -0,0 +1,307 @@
+import contextvars
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource  # Not available on Windows
+except ImportError:
+    resource = None
+
+# Spans are appended as JSON lines to <TRACE_DIR>/<job id>.jsonl
+TRACE_DIR = os.environ.get("ZOMBIE_TRACE_DIR", "logs/traces")
+
+_local = threading.local()
+_write_lock = threading.Lock()
+# Set by job_scope() for stages that run inside a long-lived process
+_scoped_job = contextvars.ContextVar("zombie_job", default=None)
+# Peak RSS of a process that serves many jobs says nothing about one span;
+# such processes report their RSS at the end of each span instead. Their
+# process-wide CPU counters mix concurrent jobs too, so their spans time the
+# calling thread and only the children started through run() / wait_child().
+_long_lived = False
+# How often wait_child() checks a child that has a timeout
+_CHILD_POLL_SECONDS = 0.05
+
+def job_id():
+    """The current job id: the enclosing job_scope(), else the one run.py put in the environment."""
+    return _scoped_job.get() or os.environ.get("ZOMBIE_JOB_ID", "local")
+
+@contextmanager
+def job_scope(job):
+    """Attributes spans (and job_id() callers) in this thread's block to `job`."""
+    token = _scoped_job.set(job)
+    try:
+        yield job
+    finally:
+        _scoped_job.reset(token)
+
+def long_lived_process():
+    """Marks this process as serving many jobs (the server, pool workers)."""
+    global _long_lived
+    _long_lived = True
+
+def trace_path(job=None):
+    return os.path.join(TRACE_DIR, f"{job or job_id()}.jsonl")
+
+def _rusage(who):
+    if resource is None:
+        return None
+    return resource.getrusage(who)
+
+def _peak_rss_bytes(usage):
+    if usage is None:
+        return None
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    return usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+
+def _current_rss_bytes():
+    try:
+        with open("/proc/self/statm", encoding="ascii") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def _cpu_seconds(usage):
+    if usage is None:
+        return None
+    return usage.ru_utime + usage.ru_stime
+
+def _write(record):
+    path = trace_path(record["job"])
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    line = json.dumps(record, default=str) + "\n"
+    with _write_lock:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+@contextmanager
+def span(name, job=None, **attrs):
+    """
+    Times a block and appends one JSON line describing it to the job's trace.
+
+    Records wall time, CPU time of this process and of waited-for children
+    (ffmpeg/ffprobe), and peak RSS. Long-lived processes run several jobs at
+    once, so there cpu_s covers the calling thread only, child_cpu_s only
+    children waited for through run() / wait_child(), and RSS is the current
+    one. The yielded dict can be filled with extra attributes; if it contains
+    "frames", a "frames_per_s" rate is added. `job` overrides the job id from
+    job_scope() or the environment.
+    """
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+        _local.child_cpu = []
+    record = dict(attrs)
+    parent = stack[-1] if stack else None
+    stack.append(name)
+    child_cpu = [0.0]
+    _local.child_cpu.append(child_cpu)
+
+    long_lived = _long_lived
+    children_before = _cpu_seconds(_rusage(resource.RUSAGE_CHILDREN)) if resource and not long_lived else None
+    cpu_clock = time.thread_time if long_lived else time.process_time
+    started = time.time()
+    wall_start = time.perf_counter()
+    cpu_start = cpu_clock()
+    status = "ok"
+    try:
+        yield record
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        stack.pop()
+        _local.child_cpu.pop()
+        wall = time.perf_counter() - wall_start
+        record.update({
+            "job": job or job_id(),
+            "span": name,
+            "parent": parent,
+            "pid": os.getpid(),
+            "start": started,
+            "wall_s": round(wall, 6),
+            "cpu_s": round(cpu_clock() - cpu_start, 6),
+            "status": status,
+        })
+        if long_lived:
+            record["child_cpu_s"] = round(child_cpu[0], 6)
+        elif children_before is not None:
+            children = _rusage(resource.RUSAGE_CHILDREN)
+            record["child_cpu_s"] = round(_cpu_seconds(children) - children_before, 6)
+        if _long_lived:
+            rss = _current_rss_bytes()
+            if rss is not None:
+                record["rss_bytes"] = rss
+        else:
+            peak = _peak_rss_bytes(_rusage(resource.RUSAGE_SELF) if resource else None)
+            if peak is not None:
+                record["peak_rss_bytes"] = peak
+        if record.get("frames") and wall > 0:
+            record["frames_per_s"] = round(record["frames"] / wall, 3)
+        try:
+            _write(record)
+        except OSError as e:
+            print(f"Warning: could not write trace span {name}: {e}")
+
+def wait_child(process, timeout=None):
+    """
+    Waits for a subprocess.Popen child and charges its CPU time to this
+    thread's open spans. Returns its return code, or None if it is still
+    running after `timeout` seconds.
+    """
+    if not hasattr(os, "wait4"):
+        try:
+            return process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            return None
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        pid, status, usage = os.wait4(process.pid, 0 if deadline is None else os.WNOHANG)
+        if pid:
+            break
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(_CHILD_POLL_SECONDS)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    for cell in getattr(_local, "child_cpu", []):
+        cell[0] += usage.ru_utime + usage.ru_stime
+    return process.returncode
+
+def run(args, check=False, **kwargs):
+    """
+    subprocess.run() that charges the child's CPU time to this thread's open
+    spans (see wait_child). Only stdout can be captured.
+    """
+    with subprocess.Popen(args, **kwargs) as process:
+        try:
+            output = process.stdout.read() if process.stdout else None
+            returncode = wait_child(process)
+        except BaseException:
+            process.kill()
+            raise
+    if check and returncode:
+        raise subprocess.CalledProcessError(returncode, args, output)
+    return subprocess.CompletedProcess(args, returncode, output)
+
+def load_spans(job):
+    """Reads every span recorded for a job."""
+    path = trace_path(job)
+    if not os.path.exists(path):
+        return []
+    spans = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                try:
+                    spans.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    return spans
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+class MetricsRegistry:
+    """
+    Aggregates the spans in TRACE_DIR and renders them in Prometheus text format.
+
+    Spans are read from the trace files rather than reported in-process, so
+    jobs run by worker.py show up too; with workers on other hosts, TRACE_DIR
+    must be storage they all share. Only spans written after the registry was
+    created are counted.
+    """
+
+    def __init__(self, trace_dir=None):
+        self.trace_dir = trace_dir or TRACE_DIR
+        self._lock = threading.Lock()
+        self.jobs = {"ok": 0, "error": 0}
+        self.spans = {}
+        # trace file -> bytes already folded into the totals
+        self._offsets = {}
+        for path in self._trace_files():
+            try:
+                self._offsets[path] = os.path.getsize(path)
+            except OSError:
+                continue
+
+    def _trace_files(self):
+        try:
+            names = os.listdir(self.trace_dir)
+        except OSError:
+            return []
+        return [os.path.join(self.trace_dir, name) for name in names if name.endswith(".jsonl")]
+
+    def _observe_span(self, record):
+        stats = self.spans.setdefault(record["span"], {
+            "count": 0, "errors": 0, "wall_s": 0.0, "cpu_s": 0.0,
+            "child_cpu_s": 0.0, "peak_rss_bytes": 0, "rss_bytes": 0, "frames": 0,
+        })
+        stats["count"] += 1
+        if record.get("status") != "ok":
+            stats["errors"] += 1
+        stats["wall_s"] += record.get("wall_s", 0.0)
+        stats["cpu_s"] += record.get("cpu_s", 0.0)
+        stats["child_cpu_s"] += record.get("child_cpu_s", 0.0) or 0.0
+        stats["peak_rss_bytes"] = max(stats["peak_rss_bytes"], record.get("peak_rss_bytes") or 0)
+        stats["rss_bytes"] = max(stats["rss_bytes"], record.get("rss_bytes") or 0)
+        stats["frames"] += record.get("frames", 0) or 0
+        # The top-level job span closes once per job; run.py records the job's result on it
+        if record["span"] == "job" and record.get("parent") is None:
+            status = record.get("outcome") or record.get("status", "error")
+            self.jobs[status] = self.jobs.get(status, 0) + 1
+
+    def collect(self):
+        """Folds spans appended to the trace files since the last call into the totals."""
+        with self._lock:
+            for path in self._trace_files():
+                offset = self._offsets.get(path, 0)
+                try:
+                    if os.path.getsize(path) <= offset:
+                        continue
+                    with open(path, "rb") as f:
+                        f.seek(offset)
+                        data = f.read()
+                except OSError:
+                    continue
+                # A line still being written is picked up on the next call
+                data = data[:data.rfind(b"\n") + 1]
+                self._offsets[path] = offset + len(data)
+                for line in data.splitlines():
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if isinstance(record, dict) and "span" in record:
+                        self._observe_span(record)
+
+    def render_prometheus(self):
+        self.collect()
+        metrics = [
+            ("zombie_span_count_total", "counter", "Number of finished spans.", "count"),
+            ("zombie_span_errors_total", "counter", "Number of spans that raised.", "errors"),
+            ("zombie_span_wall_seconds_total", "counter", "Wall time spent in each span.", "wall_s"),
+            ("zombie_span_cpu_seconds_total", "counter", "CPU time of the process running the span.", "cpu_s"),
+            ("zombie_span_child_cpu_seconds_total", "counter", "CPU time of subprocesses (ffmpeg, ffprobe) waited on in the span.", "child_cpu_s"),
+            ("zombie_span_frames_total", "counter", "Frames processed inside the span.", "frames"),
+            ("zombie_span_peak_rss_bytes", "gauge", "Highest peak RSS seen for the span.", "peak_rss_bytes"),
+            ("zombie_span_rss_bytes", "gauge", "Highest RSS at span end in long-lived processes (server, pool workers).", "rss_bytes"),
+        ]
+        with self._lock:
+            lines = [
+                "# HELP zombie_jobs_total Finished render jobs.",
+                "# TYPE zombie_jobs_total counter",
+            ]
+            for status, count in sorted(self.jobs.items()):
+                lines.append(f'zombie_jobs_total{{status="{_escape_label(status)}"}} {count}')
+            for metric, kind, help_text, key in metrics:
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} {kind}")
+                for name, stats in sorted(self.spans.items()):
+                    lines.append(f'{metric}{{span="{_escape_label(name)}"}} {stats[key]}')
+        return "\n".join(lines) + "\n"
@@ -1,10 +1,13 @@
 import cv2
 import subprocess
-import random
+import seeding
 import gdown
 import os
 import sys
 from pathlib import Path
+import tracing
+import scratch
+import admission
 
 # Google Drive file ID for bg.mp4
 DRIVE_FILE_ID = "1Bg4bIqlNv-9HjAd3L2VwU4FAlUn7qGis"
@@ -15,7 +18,12 @@ def download_from_drive(file_id, output_path):
     if not os.path.exists(output_path):
         print("Downloading background video from Google Drive...")
         url = f"https://drive.google.com/uc?export=download&id={file_id}"
-        gdown.download(url, output_path, quiet=False)
+        # Concurrent jobs may both start the first download; each writes its
+        # own file and the rename makes whichever finishes first visible
+        partial_path = f"{output_path}.{os.getpid()}.part"
+        with tracing.span("video.download", output=output_path):
+            gdown.download(url, partial_path, quiet=False)
+            os.replace(partial_path, output_path)
         print("Download complete.")
     else:
         print("Background video already exists. Skipping download.")
@@ -30,12 +38,21 @@ def get_audio_duration(audio_path):
             '-of', 'default=noprint_wrappers=1:nokey=1',
             audio_path
         ]
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        with tracing.span("ffprobe", path=audio_path):
+            result = subprocess.run(cmd, capture_output=True, text=True)
         return float(result.stdout.strip())
     except Exception as e:
         print(f"Error getting audio duration: {e}")
         sys.exit(1)
 
+def get_video_size(video_path):
+    """Returns (width, height, fps) of a video file."""
+    cap = cv2.VideoCapture(video_path)
+    size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            cap.get(cv2.CAP_PROP_FPS))
+    cap.release()
+    return size
+
 def get_video_duration(video_path):
     """Returns the duration of a video file."""
     cap = cv2.VideoCapture(video_path)
@@ -54,8 +71,11 @@ def main():
 
         # Get audio durations and calculate total
         print("Getting audio durations...")
-        body_duration = get_audio_duration('audio/body.mp3')
-        title_duration = get_audio_duration('audio/title.mp3')
+        # Narration comes from audio.py through the job's scratch directory
+        title_audio = scratch.path('title.mp3')
+        body_audio = scratch.path('body.mp3')
+        body_duration = get_audio_duration(body_audio)
+        title_duration = get_audio_duration(title_audio)
         total_audio_duration = body_duration + title_duration
         print(f"Total audio duration: {total_audio_duration:.2f} seconds")
 
@@ -69,50 +89,62 @@ def main():
         if max_start <= 0:
             print("Error: Background video is shorter than combined audio")
             sys.exit(1)
-        start_time = random.uniform(0, max_start)
+        start_time = seeding.rng("background").uniform(0, max_start)
         print(f"Selected start time: {start_time:.2f} seconds")
 
+        # Intermediates live in the job's scratch directory, on tmpfs when they fit.
+        # This first real estimate may move the directory, so paths are resolved again
+        width, height, fps = get_video_size(BG_PATH)
+        estimate = scratch.estimate_job_bytes(total_audio_duration, width or 1080, height or 1920, fps or 30)
+        scratch.job_dir(estimate_bytes=estimate)
+        title_audio = scratch.path('title.mp3')
+        body_audio = scratch.path('body.mp3')
+        temp_audio = scratch.path('combined_audio.mp3')
+        temp_bg = scratch.path('bg.mp4')
+
         # First, combine the audio files
         print("Combining audio files...")
-        temp_audio = 'temp_combined_audio.mp3'
-        subprocess.run([
-            'ffmpeg', '-y',
-            '-i', 'audio/title.mp3',
-            '-i', 'audio/body.mp3',
-            '-filter_complex', '[0:a][1:a]concat=n=2:v=0:a=1[aout]',
-            '-map', '[aout]',
-            temp_audio
-        ], check=True)
+        with tracing.span("ffmpeg.audio_concat"):
+            subprocess.run([
+                'ffmpeg', '-y',
+                '-i', title_audio,
+                '-i', body_audio,
+                '-filter_complex', '[0:a][1:a]concat=n=2:v=0:a=1[aout]',
+                '-map', '[aout]',
+                temp_audio
+            ], check=True)
 
         # Extract background clip
-        temp_bg = 'temp_bg.mp4'
         print("Extracting background clip...")
-        subprocess.run([
-            'ffmpeg', '-y',
-            '-ss', str(start_time),
-            '-t', str(total_audio_duration),
-            '-i', BG_PATH,
-            '-c:v', 'libx264',
-            '-preset', 'ultrafast',
-            '-crf', '23',
-            '-an',  # Remove any existing audio
-            temp_bg
-        ], check=True)
+        with admission.slot("render"), tracing.span("ffmpeg.extract_bg", duration_s=total_audio_duration):
+            subprocess.run([
+                'ffmpeg', '-y',
+                '-ss', str(start_time),
+                '-t', str(total_audio_duration),
+                '-i', BG_PATH,
+                '-c:v', 'libx264',
+                '-preset', 'ultrafast',
+                '-crf', '23',
+                '-an',  # Remove any existing audio
+                temp_bg
+            ], check=True)
 
         # Combine video and combined audio
         print("Combining video and audio...")
-        output_video = 'content/edit1.mp4'
-        subprocess.run([
-            'ffmpeg', '-y',
-            '-i', temp_bg,
-            '-i', temp_audio,
-            '-c:v', 'copy',
-            '-c:a', 'libmp3lame',
-            '-map', '0:v:0',  # Map video from first input
-            '-map', '1:a:0',  # Map audio from second input
-            '-shortest',
-            output_video
-        ], check=True)
+        # Handed to edit.py through the job's scratch directory, like the other intermediates
+        output_video = scratch.path('edit1.mp4')
+        with tracing.span("ffmpeg.combine"):
+            subprocess.run([
+                'ffmpeg', '-y',
+                '-i', temp_bg,
+                '-i', temp_audio,
+                '-c:v', 'copy',
+                '-c:a', 'libmp3lame',
+                '-map', '0:v:0',  # Map video from first input
+                '-map', '1:a:0',  # Map audio from second input
+                '-shortest',
+                output_video
+            ], check=True)
 
         # Clean up temporary files
         print("Cleaning up temporary files...")
@@ -139,4 +171,5 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
+    with tracing.span("stage.video"):
+        main()
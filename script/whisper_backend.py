@@ -0,0 +1,44 @@
+import os
+
+import torch
+import whisper
+
+import encoding
+
+# Subtitle timing model. "fp32" is the stock openai-whisper model; "int8" applies
+# dynamic int8 quantization to every Linear layer for faster CPU inference.
+# Read in encoding, since they change the rendered subtitles and so the cache key.
+WHISPER_MODEL = encoding.WHISPER_MODEL
+WHISPER_BACKEND = encoding.WHISPER_BACKEND
+WHISPER_THREADS = int(os.environ.get("ZOMBIE_WHISPER_THREADS", "0"))  # 0 = torch default
+
+BACKENDS = ("fp32", "int8")
+
+def quantize_int8(model):
+    """Returns a copy of `model` with Linear weights dynamically quantized to int8."""
+    # whisper.model.Linear only overrides forward() to cast weights for fp16;
+    # quantize_dynamic matches exact types, so expose those layers as plain Linear
+    for module in model.modules():
+        if isinstance(module, torch.nn.Linear) and type(module) is not torch.nn.Linear:
+            module.__class__ = torch.nn.Linear
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+def load_model(name=WHISPER_MODEL, backend=WHISPER_BACKEND, threads=WHISPER_THREADS):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown Whisper backend '{backend}'. Must be one of {BACKENDS}.")
+    if threads:
+        torch.set_num_threads(threads)
+    model = whisper.load_model(name, device="cpu")
+    if backend == "int8":
+        model = quantize_int8(model)
+    return model.eval()
+
+def transcribe_words(model, samples):
+    """Returns [{"word", "start", "end"}] for 16 kHz mono float32 samples."""
+    result = model.transcribe(samples, word_timestamps=True, fp16=False)
+    return [
+        {"word": word_info["word"].strip(), "start": word_info["start"], "end": word_info["end"]}
+        for segment in result["segments"]
+        for word_info in segment["words"]
+        if word_info["word"].strip()
+    ]
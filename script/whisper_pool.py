@@ -0,0 +1,64 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import admission
+import tracing
+
+SAMPLE_RATE = 16000  # whisper.audio.SAMPLE_RATE
+
+# Transcription runs in its own spawned processes: torch and the model stay out
+# of the server, each process keeps its model loaded across jobs, and a native
+# crash costs a fresh worker rather than the server. One process per host slot.
+_pool = None
+_pool_lock = threading.Lock()
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            workers = max(1, admission.STAGE_SLOTS["whisper"])
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+            _pool = None
+
+def _discard_pool(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+# ---------------- Worker side ----------------
+# (model name, backend) -> loaded model
+_models = {}
+
+def _transcribe(job, samples):
+    import whisper_backend
+
+    tracing.long_lived_process()
+    key = (whisper_backend.WHISPER_MODEL, whisper_backend.WHISPER_BACKEND)
+    model = _models.get(key)
+    if model is None:
+        with tracing.span("whisper.load", job=job, model=key[0], backend=key[1]):
+            model = _models[key] = whisper_backend.load_model(*key)
+    with tracing.span("whisper.transcribe", job=job, model=key[0], backend=key[1],
+                      audio_s=len(samples) / SAMPLE_RATE):
+        return whisper_backend.transcribe_words(model, samples)
+
+def transcribe(samples, job=None):
+    """Word timings for 16 kHz mono float32 samples, computed in a Whisper worker."""
+    pool = _get_pool()
+    try:
+        return pool.submit(_transcribe, job or tracing.job_id(), samples).result()
+    except BrokenProcessPool:
+        # The worker died (OOM, native crash); the next job starts a new one
+        _discard_pool(pool)
+        raise
@@ -0,0 +1,68 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "script"))
+import job_queue
+
+@pytest.fixture(params=["sqlite", "redis"])
+def queue(request, tmp_path):
+    if request.param == "sqlite":
+        return job_queue.SQLiteQueue(str(tmp_path / "jobs.db"))
+    fakeredis = pytest.importorskip("fakeredis")
+    return job_queue.RedisQueue(fakeredis.FakeRedis())
+
+def test_claim_in_enqueue_order(queue):
+    queue.enqueue("a", {"topic": "one"})
+    queue.enqueue("b", {"topic": "two"})
+    assert queue.pending_count() == 2
+    assert queue.get("b")["position"] == 1
+
+    first = queue.claim("w1")
+    assert first == {"id": "a", "payload": {"topic": "one"}, "attempt": 1}
+    assert queue.claim("w2")["id"] == "b"
+    assert queue.claim("w3") is None
+    assert queue.pending_count() == 0
+    assert queue.get("a")["state"] == job_queue.RUNNING
+    assert queue.get("a")["worker"] == "w1"
+
+def test_complete_and_heartbeat_by_owner(queue):
+    queue.enqueue("a", {})
+    queue.claim("w1")
+    assert queue.heartbeat("a", "w1")
+    assert not queue.heartbeat("a", "w2")
+    assert not queue.complete("a", "w2")
+    assert queue.complete("a", "w1", job_queue.FAILED, "boom")
+    status = queue.get("a")
+    assert status["state"] == job_queue.FAILED
+    assert status["error"] == "boom"
+    # Finished jobs are neither renewed nor handed out again
+    assert not queue.heartbeat("a", "w1")
+    assert queue.claim("w2") is None
+
+def test_expired_lease_is_reclaimed(queue):
+    queue.enqueue("a", {"topic": "one"})
+    queue.claim("w1", lease_seconds=-1)
+
+    reclaimed = queue.claim("w2")
+    assert reclaimed == {"id": "a", "payload": {"topic": "one"}, "attempt": 2}
+    assert queue.get("a")["worker"] == "w2"
+
+    # The first worker's late heartbeat and result are ignored
+    assert not queue.heartbeat("a", "w1")
+    assert not queue.complete("a", "w1")
+    assert queue.complete("a", "w2")
+    assert queue.get("a")["state"] == job_queue.DONE
+
+def test_job_fails_after_max_attempts(queue, monkeypatch):
+    monkeypatch.setattr(job_queue, "MAX_ATTEMPTS", 2)
+    queue.enqueue("a", {})
+    queue.claim("w1", lease_seconds=-1)
+    queue.claim("w2", lease_seconds=-1)
+
+    assert queue.claim("w3") is None
+    status = queue.get("a")
+    assert status["state"] == job_queue.FAILED
+    assert status["error"] == "lease expired"
+    assert status["attempts"] == 2
@@ -0,0 +1,135 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "script"))
+import encoding
+import timeline
+
+FPS = 30
+WIDTH, HEIGHT = 1080, 1920
+BASE_FONT_SIZE, MAX_FONT_SIZE = 60.0, 65.0
+OVERLAY_SIZE = int(min(WIDTH, HEIGHT) / 1.2)
+OVERLAY_FRAMES = int(2.5 * FPS)
+ZOOM_IN_FRAMES = int(FPS * 0.3)
+FALL_OUT_FRAMES = int(FPS * 0.3)
+TOTAL_FRAMES = 8 * FPS
+
+# Narration-like timings: short gaps between words, one long pause
+WORDS = [
+    {"word": "the", "start": 0.10, "end": 0.32},
+    {"word": "zombies", "start": 0.40, "end": 0.91},
+    {"word": "came", "start": 1.00, "end": 1.27},
+    {"word": "at", "start": 1.35, "end": 1.42},
+    {"word": "night", "start": 1.50, "end": 2.05},
+    {"word": "and", "start": 3.70, "end": 3.88},
+    {"word": "nobody", "start": 3.95, "end": 4.61},
+    {"word": "ran", "start": 4.70, "end": 5.13},
+]
+
+# ---- Reference: the per-frame logic compile_timeline replaced ----
+
+def _ease_in_out_quad(t):
+    return 2 * t * t if t < 0.5 else -1 + (4 - 2 * t) * t
+
+def _subtitle_state(word_info, current_time):
+    # process_subtitle_frame
+    if not word_info["start"] <= current_time <= word_info["end"] + 0.15:
+        return None
+    t = min(1, (current_time - word_info["start"]) / 0.3)
+    scale = int(int(BASE_FONT_SIZE) + (int(MAX_FONT_SIZE) - int(BASE_FONT_SIZE)) * (1 - (1 - t) ** 2))
+    if current_time > word_info["end"]:
+        alpha = max(0, 1 - min(1, (current_time - word_info["end"]) / 0.15))
+    else:
+        alpha = 1
+    return scale, alpha
+
+def _title_state(frame_count):
+    # apply_title_overlay
+    if frame_count >= OVERLAY_FRAMES:
+        return 0, 0
+    scale = 1
+    y_offset = 0
+    if frame_count < ZOOM_IN_FRAMES:
+        scale = 0.5 + (0.5 * _ease_in_out_quad(frame_count / ZOOM_IN_FRAMES))
+    elif frame_count > OVERLAY_FRAMES - FALL_OUT_FRAMES:
+        t = (frame_count - (OVERLAY_FRAMES - FALL_OUT_FRAMES)) / FALL_OUT_FRAMES
+        y_offset = int(_ease_in_out_quad(t) * (HEIGHT * 0.5))
+    return int(OVERLAY_SIZE * scale), y_offset
+
+def _walk_frame_range(word_durations, start_frame, end_frame):
+    # process_frame_range: finds its starting word, then walks one word per frame
+    states = []
+    current_frame = start_frame
+    word_index = 0
+    for i, word in enumerate(word_durations):
+        if current_frame / FPS < word["end"]:
+            word_index = i
+            break
+    while current_frame < end_frame:
+        current_time = current_frame / FPS
+        subtitle = None
+        if word_index < len(word_durations):
+            word_info = word_durations[word_index]
+            if current_time >= word_info["end"]:
+                word_index += 1
+            else:
+                state = _subtitle_state(word_info, current_time)
+                if state:
+                    subtitle = (word_index,) + state
+        states.append((subtitle, _title_state(current_frame)))
+        current_frame += 1
+    return states
+
+def _compiled_states(compiled, start_frame, end_frame):
+    states = []
+    for frame in range(start_frame, end_frame):
+        subtitle = None
+        word_id = int(compiled["word_id"][frame])
+        if word_id >= 0:
+            subtitle = (word_id, int(compiled["font_size"][frame]), float(compiled["alpha"][frame]))
+        states.append((subtitle, (int(compiled["title_size"][frame]), int(compiled["title_y"][frame]))))
+    return states
+
+def _compile(word_durations, total_frames=TOTAL_FRAMES):
+    return timeline.compile_timeline(
+        word_durations, FPS, total_frames, HEIGHT, BASE_FONT_SIZE, MAX_FONT_SIZE,
+        OVERLAY_SIZE, OVERLAY_FRAMES, ZOOM_IN_FRAMES, FALL_OUT_FRAMES)
+
+@pytest.mark.parametrize("chunks", [1, 4, 7])
+def test_timeline_matches_per_frame_walk(chunks):
+    compiled = _compile(WORDS)
+    bounds = [TOTAL_FRAMES * i // chunks for i in range(chunks + 1)]
+    for start_frame, end_frame in zip(bounds, bounds[1:]):
+        assert _compiled_states(compiled, start_frame, end_frame) == _walk_frame_range(WORDS, start_frame, end_frame)
+
+def test_timeline_without_words_keeps_title():
+    compiled = _compile([])
+    assert (compiled["word_id"] == -1).all()
+    assert _compiled_states(compiled, 0, TOTAL_FRAMES) == [(None, _title_state(frame)) for frame in range(TOTAL_FRAMES)]
+
+def test_timeline_title_shorter_than_animations():
+    # A title shorter than its zoom-in never falls out; the zoom wins
+    compiled = timeline.compile_timeline(
+        [], FPS, FPS, HEIGHT, BASE_FONT_SIZE, MAX_FONT_SIZE, OVERLAY_SIZE, 5, ZOOM_IN_FRAMES, FALL_OUT_FRAMES)
+    assert (compiled["title_y"] == 0).all()
+    assert (compiled["title_size"][5:] == 0).all()
+    assert compiled["title_size"][0] == OVERLAY_SIZE // 2
+
+# ---- Rendition planning ----
+
+def test_plan_renditions_portrait():
+    sizes, skipped = encoding.plan_renditions(["source", "1080p", "720p", "480p"], 1080, 1920)
+    assert sizes == {"source": None, "720p": (720, 1280), "480p": (480, 854)}
+    assert skipped == ["1080p"]
+
+def test_plan_renditions_landscape():
+    sizes, skipped = encoding.plan_renditions(["source", "720p"], 1920, 1080)
+    assert sizes == {"source": None, "720p": (1280, 720)}
+    assert skipped == []
+
+def test_plan_renditions_never_upscales():
+    sizes, skipped = encoding.plan_renditions(["source", "1080p", "720p", "480p"], 854, 480)
+    assert sizes == {"source": None}
+    assert skipped == ["1080p", "720p", "480p"]
@@ -0,0 +1,75 @@
+import os
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "script"))
+import job_queue
+import admission
+import artifacts
+import pipeline
+import scratch
+
+# How long an idle worker waits before asking the queue again
+POLL_SECONDS = float(os.environ.get("ZOMBIE_POLL_SECONDS", "2"))
+WORKER_ID = os.environ.get("ZOMBIE_WORKER_ID") or f"{socket.gethostname()}-{os.getpid()}"
+
+def keep_lease(queue, job_id, stop, lost):
+    """Renews the job's lease until `stop` is set or another worker takes the job over."""
+    while not stop.wait(job_queue.LEASE_SECONDS / 3):
+        if not queue.heartbeat(job_id, WORKER_ID):
+            print(f"Lost the lease on job {job_id}; stopping it")
+            lost.set()
+            return
+
+def run_job(queue, claimed):
+    job_id = claimed["id"]
+    payload = claimed["payload"]
+    print(f"Worker {WORKER_ID} running job {job_id} (attempt {claimed['attempt']})")
+
+    stop = threading.Event()
+    # Set once another worker has reclaimed the job; the pipeline stops and publishes nothing
+    lost = threading.Event()
+    heartbeat = threading.Thread(target=keep_lease, args=(queue, job_id, stop, lost), daemon=True)
+    heartbeat.start()
+    error = None
+    try:
+        # Its own scratch directory, so the reclaiming worker's files are never touched
+        with scratch.attempt_scope(claimed["attempt"]):
+            status = pipeline.run_scripts(payload["topic"], threading.Event(), job_id, payload.get("seed"), lost)
+    except Exception as e:
+        status, error = "error", str(e)
+    finally:
+        stop.set()
+        heartbeat.join()
+
+    if lost.is_set():
+        return
+    # The video is in the shared artifact store, where the API serves it from
+    if status == "ok" and os.path.exists(artifacts.video_path(job_id)):
+        queue.complete(job_id, WORKER_ID, job_queue.DONE)
+    else:
+        queue.complete(job_id, WORKER_ID, job_queue.FAILED, error or "pipeline failed")
+
+def main():
+    if not job_queue.QUEUE_URL:
+        print("Error: set ZOMBIE_QUEUE_URL to the queue the API enqueues into.")
+        sys.exit(1)
+    queue = job_queue.open_queue()
+    print(f"Worker {WORKER_ID} polling {job_queue.QUEUE_URL}")
+    while True:
+        # Leave jobs for other hosts while this one is short on RAM or CPU
+        ok, reason = admission.resources_available()
+        if not ok:
+            print(f"Not claiming jobs: {reason}")
+            time.sleep(POLL_SECONDS)
+            continue
+        claimed = queue.claim(WORKER_ID)
+        if claimed is None:
+            time.sleep(POLL_SECONDS)
+            continue
+        run_job(queue, claimed)
+
+if __name__ == "__main__":
+    main()